@@ -0,0 +1,65 @@
+import string
+
+def rowName(row):
+    # 0 -> 'A', 25 -> 'Z', 26 -> 'AA', 31 -> 'AF'
+    name = ''
+    row += 1
+    while row:
+        row, rest = divmod(row - 1, 26)
+        name = string.ascii_uppercase[rest] + name
+    return name
+
+def columnName(column):
+    return str(column + 1)
+
+ROW_NAMES = [rowName(row) for row in range(26 * 27)]
+COLUMN_NAMES = [columnName(column) for column in range(999)]
+
+def split(address):
+    # 'AF48' -> ('AF', '48')
+    address = address.upper()
+    n = len(address.rstrip(string.digits))
+    return address[:n], address[n:]
+
+class Codec(object):
+    def __init__(self, nrow, ncol):
+        self.nrow = nrow
+        self.ncol = ncol
+        self.row_names = ROW_NAMES[:nrow]
+        self.column_names = COLUMN_NAMES[:ncol]
+        self.names = [row + column for row in self.row_names for column in self.column_names]
+        self._linear = dict((name, idx) for idx, name in enumerate(self.names))
+        self._rows = dict((name, idx) for idx, name in enumerate(self.row_names))
+        self._columns = dict((name, idx) for idx, name in enumerate(self.column_names))
+    def __contains__(self, address):
+        return address in self._linear or address.upper() in self._linear
+    def inBounds(self, row, column):
+        return 0 <= row < self.nrow and 0 <= column < self.ncol
+    def name(self, row, column):
+        if not self.inBounds(row, column):
+            return None
+        return self.names[row * self.ncol + column]
+    def linear(self, address):
+        idx = self._linear.get(address)
+        if idx is None:
+            idx = self._linear.get(address.upper())
+        return idx
+    def fromLinear(self, idx):
+        return divmod(idx, self.ncol)
+    def position(self, address):
+        idx = self.linear(address)
+        if idx is None:
+            return None
+        return divmod(idx, self.ncol)
+    def rowIndex(self, row_name):
+        return self._rows.get(row_name.upper())
+    def columnIndex(self, column_name):
+        return self._columns.get(column_name)
+
+_codecs = {}
+
+def codec(nrow, ncol):
+    key = (nrow, ncol)
+    if key not in _codecs:
+        _codecs[key] = Codec(nrow, ncol)
+    return _codecs[key]
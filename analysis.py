@@ -0,0 +1,435 @@
+import math
+from itertools import izip
+import numpy as np
+import columnar
+import instrument
+
+# Relative quantification (2^-ddCt) over columnar tables (columnar.table or
+# columnar.load), so plates of either model can be analysed together.
+# Per sample x assay arrays are indexed [sample code, assay code].
+
+def _codes(names, wanted):
+    lookup = dict((name, code) for code, name in enumerate(names))
+    return np.array([lookup[name] for name in wanted if name in lookup], dtype = np.intp)
+
+def groupStats(codes, values, length):
+    # count, mean and SD of values per code in [0, length); SD is NaN below
+    # two values
+    counts = np.bincount(codes, minlength = length).astype(float)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean = np.bincount(codes, values, length) / counts
+        # two passes, sum of squares about the mean
+        var = np.bincount(codes, (values - mean[codes]) ** 2, length) / (counts - 1)
+    var[counts < 2] = np.nan
+    return counts.astype(int), mean, np.sqrt(var)
+
+def replicates(columns):
+    # Ct mean, SD and count per sample x assay, leaving out omitted and
+    # empty wells
+    samples = np.asarray(columns['sample'])
+    assays = np.asarray(columns['assay'])
+    values = np.asarray(columns['value'])
+    n_samples = len(columns['samples'])
+    n_assays = len(columns['assays'])
+    used = (samples >= 0) & (assays >= 0) & ~np.isnan(values) & ~np.asarray(columns['omit'])
+    codes = samples[used] * n_assays + assays[used]
+    counts, mean, sd = groupStats(codes, values[used], n_samples * n_assays)
+    shape = (n_samples, n_assays)
+    return mean.reshape(shape), sd.reshape(shape), counts.reshape(shape)
+
+def groupMedians(codes, values, length):
+    # median of values per code in [0, length), NaN for empty codes
+    order = np.lexsort((values, codes))
+    ordered = values[order]
+    counts = np.bincount(codes, minlength = length)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(length, np.nan)
+    has = counts > 0
+    low = (starts + (counts - 1) // 2)[has]
+    high = (starts + counts // 2)[has]
+    medians[has] = (ordered[low] + ordered[high]) / 2
+    return medians
+
+def _tTail(t, df):
+    # P(T > t) for Student's t with integer df (Abramowitz & Stegun 26.7.3-4)
+    theta = math.atan2(t, math.sqrt(df))
+    c2 = math.cos(theta) ** 2
+    term = total = 1.0
+    if df % 2:
+        for k in range(1, (df - 1) // 2):
+            term *= c2 * 2 * k / (2 * k + 1)
+            total += term
+        inside = 2 / math.pi * (theta + (math.sin(theta) * math.cos(theta) * total if df > 1 else 0))
+    else:
+        for k in range(1, df // 2):
+            term *= c2 * (2 * k - 1) / (2 * k)
+            total += term
+        inside = math.sin(theta) * total
+    return (1 - inside) / 2
+
+_grubbs = {}
+
+def grubbsCritical(n, alpha = 0.05):
+    # two-sided Grubbs critical value for n values
+    key = (n, alpha)
+    if key not in _grubbs:
+        p = alpha / (2 * n)
+        low, high = 0.0, 1e7
+        for i in range(200):
+            middle = (low + high) / 2
+            if _tTail(middle, n - 2) > p:
+                low = middle
+            else:
+                high = middle
+        t2 = low * low
+        _grubbs[key] = (n - 1) / math.sqrt(n) * math.sqrt(t2 / (n - 2 + t2))
+    return _grubbs[key]
+
+RULES = {'median' : 0.5, 'mad' : 3.5, 'grubbs' : 0.05}
+
+class ReplicateIndex(object):
+    # (sample, detector) -> wells of model plates, built once; stats() then
+    # reads the values and omit flags and aggregates them in one pass
+    def __init__(self, plates):
+        pairs = {}
+        entry_pair = []
+        entry_well = []
+        self.wells = []
+        for plate in plates:
+            for address in plate.codec.names:
+                well = plate.wells[address]
+                if not (well.samples and well.detectors):
+                    continue
+                for sample in well.samples:
+                    for detector in well.detectors:
+                        key = (sample, detector)
+                        k = pairs.get(key)
+                        if k is None:
+                            k = pairs[key] = len(pairs)
+                        entry_pair.append(k)
+                        entry_well.append(len(self.wells))
+                self.wells.append(well)
+        # pairs in name order, whatever order the sets gave them
+        self.pairs = sorted(pairs, key = lambda pair: (pair[0].getName(), pair[1].getName()))
+        rank = np.empty(len(self.pairs), dtype = np.intp)
+        rank[[pairs[pair] for pair in self.pairs]] = np.arange(len(self.pairs))
+        self.entry_pair = rank[np.array(entry_pair, dtype = np.intp)]
+        self.entry_well = np.array(entry_well, dtype = np.intp)
+        self.entry_detector = [self.pairs[code][1] for code in self.entry_pair.tolist()]
+        # well -> why outliers() omitted it, for the wells it omitted last
+        self.explanations = {}
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def values(self):
+        # value of each (well, detector) entry, NaN where there is none
+        measured = [well.values or {} for well in self.wells]
+        values = [measured[w].get(detector, detector.value) for w, detector in
+                  izip(self.entry_well.tolist(), self.entry_detector)]
+        return np.array(values, dtype = np.float64)
+
+    def omitted(self):
+        return np.array([well.omit for well in self.wells], dtype = bool)[self.entry_well]
+
+    def outliers(self, rule = 'median', threshold = None, min_count = 3, apply = True):
+        # rule 'median': further than threshold Ct from the replicate median
+        #      'mad': modified z-score |x - median| / (1.4826 MAD) over threshold
+        #      'grubbs': the most extreme replicate, at significance threshold
+        # Wells this index omitted before are reconsidered, wells omitted by
+        # hand are left alone. Returns {well: explanation}; with apply the
+        # flagged wells are omitted and the others restored.
+        if rule not in RULES:
+            raise ValueError('unknown outlier rule: %r' % (rule,))
+        if threshold is None:
+            threshold = RULES[rule]
+        values = self.values()
+        previous = self.explanations
+        manual = np.array([well.omit and well not in previous for well in self.wells], dtype = bool)
+        used = np.nonzero(~np.isnan(values) & ~manual[self.entry_well])[0]
+        pairs = self.entry_pair[used]
+        x = values[used]
+        length = len(self.pairs)
+        counts = np.bincount(pairs, minlength = length)
+        median = groupMedians(pairs, x, length)
+        deviation = np.abs(x - median[pairs])
+        if rule == 'median':
+            center, score = median, deviation
+            limit = np.full(len(x), threshold)
+            text = '%s %s: %.2f is %.2f from the median %.2f (limit %.2f)'
+        elif rule == 'mad':
+            mad = 1.4826 * groupMedians(pairs, deviation, length)
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                score = deviation / mad[pairs]
+            center = median
+            limit = np.full(len(x), threshold)
+            text = '%s %s: %.2f is %.2f MADs from the median %.2f (limit %.2f)'
+        else:
+            center, sd = groupStats(pairs, x, length)[1:]
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                score = np.abs(x - center[pairs]) / sd[pairs]
+            score[np.isnan(score)] = 0
+            # one outlier per pair at most, the value furthest from the mean
+            order = np.lexsort((score, pairs))
+            last = (np.cumsum(counts) - 1)[counts > 0]
+            critical = np.array([grubbsCritical(n, threshold) if n >= 3 else np.inf
+                                 for n in range(counts.max() + 1 if len(x) else 1)])
+            limit = np.full(len(x), np.inf)
+            limit[order[last]] = critical[counts[pairs[order[last]]]]
+            text = '%s %s: %.2f has Grubbs G %.2f about the mean %.2f (critical %.2f)'
+        flagged = np.nonzero((score > limit) & (counts[pairs] >= min_count))[0]
+        explanations = {}
+        for e in flagged.tolist():
+            sample, detector = self.pairs[pairs[e]]
+            well = self.wells[self.entry_well[used[e]]]
+            line = text % (sample.getName(), detector.getName(), x[e], score[e], center[pairs[e]], limit[e])
+            explanations[well] = explanations[well] + '; ' + line if well in explanations else line
+        if apply:
+            for well in previous:
+                well.include()
+            for well in explanations:
+                well.exclude()
+            self.explanations = explanations
+        return explanations
+
+    def stats(self):
+        values = self.values()
+        used = ~np.isnan(values) & ~self.omitted()
+        counts, mean, sd = groupStats(self.entry_pair[used], values[used], len(self.pairs))
+        samples = [sample.getName() for sample, detector in self.pairs]
+        detectors = [detector.getName() for sample, detector in self.pairs]
+        table = np.zeros(len(self.pairs), dtype = [
+            ('sample', 'S%d' % max([1] + map(len, samples))),
+            ('detector', 'S%d' % max([1] + map(len, detectors))),
+            ('count', np.int32), ('mean', np.float64), ('sd', np.float64), ('cv', np.float64)])
+        table['sample'] = samples
+        table['detector'] = detectors
+        table['count'] = counts
+        table['mean'] = mean
+        table['sd'] = sd
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            table['cv'] = sd / mean
+        return table
+
+def sampleGroups(columns, groups = None):
+    # group code per sample code, from the table or a {sample: group} dict
+    names = columns['groups'].tolist()
+    codes = np.asarray(columns['sample_group'], dtype = np.intp)
+    if groups is None:
+        return names, codes
+    names = sorted(set(groups.values()))
+    lookup = dict((name, code) for code, name in enumerate(names))
+    codes = np.array([lookup.get(groups.get(sample), -1) for sample in columns['samples'].tolist()], dtype = np.intp)
+    return names, codes
+
+class Result(object):
+    def __init__(self, samples, assays, **arrays):
+        self.samples = samples
+        self.assays = assays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def get(self, sample, assay):
+        s = self.samples.index(sample)
+        a = self.assays.index(assay)
+        return dict((name, getattr(self, name)[s, a]) for name in
+                    ('ct', 'ct_sd', 'n', 'dct', 'dct_sd', 'ddct', 'ddct_sd', 'fold', 'fold_low', 'fold_high'))
+
+    def rows(self):
+        # (sample, assay, fold, fold_low, fold_high) for every measured pair
+        for s, a in zip(*np.nonzero(self.n)):
+            yield (self.samples[s], self.assays[a], self.fold[s, a], self.fold_low[s, a], self.fold_high[s, a])
+
+def ddct(columns, references, controls, groups = None):
+    # references: assay names to normalise against (their Ct averaged per
+    # sample); controls: group names whose samples are the calibrator
+    samples = columns['samples'].tolist()
+    assays = columns['assays'].tolist()
+    ct, ct_sd, n = replicates(columns)
+    refs = _codes(assays, references)
+    if not len(refs):
+        raise ValueError('none of the reference assays %r were measured' % (list(references),))
+    # dCt against the mean of the reference assays of the same sample
+    ref_ct = ct[:, refs].mean(axis = 1)
+    ref_sd = np.sqrt((ct_sd[:, refs] ** 2).sum(axis = 1)) / len(refs)
+    dct = ct - ref_ct[:, None]
+    dct_sd = np.sqrt(ct_sd ** 2 + ref_sd[:, None] ** 2)
+    # ddCt against the mean dCt of the control samples, per assay
+    group_names, sample_group = sampleGroups(columns, groups)
+    control = np.in1d(sample_group, _codes(group_names, controls)) & (sample_group >= 0)
+    if not control.any():
+        raise ValueError('no samples in the control groups %r' % (list(controls),))
+    measured = control[:, None] & ~np.isnan(dct)
+    n_control = measured.sum(axis = 0)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        calibrator = np.where(measured, dct, 0).sum(axis = 0) / n_control
+        calibrator_sd = np.sqrt(np.where(measured, dct_sd ** 2, 0).sum(axis = 0)) / n_control
+    ddct = dct - calibrator
+    ddct_sd = np.sqrt(dct_sd ** 2 + calibrator_sd ** 2)
+    return Result(samples, assays, ct = ct, ct_sd = ct_sd, n = n,
+                  dct = dct, dct_sd = dct_sd, ddct = ddct, ddct_sd = ddct_sd,
+                  fold = 2 ** -ddct, fold_low = 2 ** -(ddct + ddct_sd), fold_high = 2 ** -(ddct - ddct_sd))
+
+def analyse(plates, references, controls, groups = None):
+    return ddct(columnar.table(plates), references, controls, groups)
+
+def experimentSettings(experiment, controls):
+    # references and sample groups of a main3.Experiment
+    references = [assay for assay in experiment.get('a') if experiment.isRef(assay)]
+    return references, controls, dict(zip(experiment.get('s'), experiment.get('g')))
+
+def catalogSettings(catalog):
+    # references and controls flagged on model Detectors and Groups; the
+    # sample groups travel in the table
+    references = [detector.getName() for detector in catalog.getDetectors() if detector.isControl()]
+    controls = [group.getName() for group in catalog.getGroups() if group.isControl()]
+    return references, controls, None
+
+class Tracker(object):
+    # Live replicate statistics and ddCt of model plates. Attached plates
+    # report every well edit (model.Well.touch); the edited wells are
+    # re-indexed and the (sample, detector) pairs they fed or now feed are
+    # dropped from the cache, to be recomputed on the next read. Per-detector
+    # calibrators are dropped only when a control sample's pair changes.
+    def __init__(self, plates = (), references = (), controls = ()):
+        self.references = set(references)
+        self.controls = set(controls)
+        self.dirty = set()
+        self.well_pairs = {}
+        self.pair_wells = {}
+        self.detector_samples = {}
+        self.aggregates = {}
+        self.calibrators = {}
+        self.calibrated = set()
+        for plate in plates:
+            self.attach(plate)
+
+    def attach(self, plate):
+        plate.tracker = self
+        self.dirty.update(plate.wells.values())
+        return self
+
+    def touch(self, well):
+        self.dirty.add(well)
+
+    def isReference(self, detector):
+        return detector.getName() in self.references
+
+    def isControl(self, sample):
+        group = sample.getGroup()
+        return group is not None and group.getName() in self.controls
+
+    def _refresh(self):
+        if not self.dirty:
+            return
+        wells, self.dirty = self.dirty, set()
+        for well in wells:
+            old = self.well_pairs.pop(well, ())
+            new = []
+            if well.plate.tracker is self:
+                new = [(sample, detector) for sample in well.samples for detector in well.detectors]
+            for pair in old:
+                members = self.pair_wells[pair]
+                members.discard(well)
+                if not members:
+                    del self.pair_wells[pair]
+                    self._forget(pair)
+                self._invalidate(pair)
+            for pair in new:
+                members = self.pair_wells.get(pair)
+                if members is None:
+                    members = self.pair_wells[pair] = set()
+                    self.detector_samples.setdefault(pair[1], set()).add(pair[0])
+                    if self.isReference(pair[1]):
+                        # the reference Ct of every sample may change
+                        self.calibrators.clear()
+                members.add(well)
+                self._invalidate(pair)
+            if new:
+                self.well_pairs[well] = new
+            instrument.count('analysis.Tracker.wells')
+
+    def _forget(self, pair):
+        sample, detector = pair
+        samples = self.detector_samples[detector]
+        samples.discard(sample)
+        if not samples:
+            del self.detector_samples[detector]
+        if self.isReference(detector):
+            self.calibrators.clear()
+
+    def _invalidate(self, pair):
+        self.aggregates.pop(pair, None)
+        sample, detector = pair
+        if sample in self.calibrated or self.isControl(sample):
+            if self.isReference(detector):
+                self.calibrators.clear()
+            else:
+                self.calibrators.pop(detector, None)
+
+    def pairs(self):
+        self._refresh()
+        return sorted(self.pair_wells, key = lambda pair: (pair[0].getName(), pair[1].getName()))
+
+    def stats(self, sample, detector):
+        # (count, mean, SD) of the Ct of a pair, as groupStats
+        self._refresh()
+        pair = (sample, detector)
+        stats = self.aggregates.get(pair)
+        if stats is None:
+            values = [well.getValue(detector) for well in self.pair_wells.get(pair, ()) if not well.omit]
+            values = [float(value) for value in values if value is not None and value == value]
+            n = len(values)
+            mean = sd = np.nan
+            if n:
+                mean = sum(values) / n
+            if n > 1:
+                sd = math.sqrt(sum([(value - mean) ** 2 for value in values]) / (n - 1))
+            stats = self.aggregates[pair] = (n, mean, sd)
+            instrument.count('analysis.Tracker.pairs')
+        return stats
+
+    def _dct(self, sample, detector):
+        n, ct, ct_sd = self.stats(sample, detector)
+        refs = [self.stats(sample, reference)[1:] for reference in self.detector_samples
+                if self.isReference(reference)]
+        if not refs:
+            return np.nan, np.nan
+        ref_ct = sum([mean for mean, sd in refs]) / len(refs)
+        ref_sd = math.sqrt(sum([sd ** 2 for mean, sd in refs])) / len(refs)
+        return ct - ref_ct, math.sqrt(ct_sd ** 2 + ref_sd ** 2)
+
+    def _calibrator(self, detector):
+        calibrator = self.calibrators.get(detector)
+        if calibrator is None:
+            dcts = []
+            for sample in self.detector_samples.get(detector, ()):
+                if self.isControl(sample):
+                    self.calibrated.add(sample)
+                    dct, dct_sd = self._dct(sample, detector)
+                    if not math.isnan(dct):
+                        dcts.append((dct, dct_sd))
+            calibrator = (np.nan, np.nan)
+            if dcts:
+                calibrator = (sum([mean for mean, sd in dcts]) / len(dcts),
+                              math.sqrt(sum([sd ** 2 for mean, sd in dcts])) / len(dcts))
+            self.calibrators[detector] = calibrator
+        return calibrator
+
+    def result(self, sample, detector):
+        # the fields of Result.get for one pair
+        n, ct, ct_sd = self.stats(sample, detector)
+        dct, dct_sd = self._dct(sample, detector)
+        calibrator, calibrator_sd = self._calibrator(detector)
+        ddct = dct - calibrator
+        ddct_sd = math.sqrt(dct_sd ** 2 + calibrator_sd ** 2)
+        return {'ct' : ct, 'ct_sd' : ct_sd, 'n' : n, 'dct' : dct, 'dct_sd' : dct_sd,
+                'ddct' : ddct, 'ddct_sd' : ddct_sd, 'fold' : 2 ** -ddct,
+                'fold_low' : 2 ** -(ddct + ddct_sd), 'fold_high' : 2 ** -(ddct - ddct_sd)}
+
+    def rows(self):
+        # as Result.rows, in name order
+        for sample, detector in self.pairs():
+            result = self.result(sample, detector)
+            if result['n']:
+                yield (sample.getName(), detector.getName(), result['fold'], result['fold_low'], result['fold_high'])
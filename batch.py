@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# Headless layout generation for a manifest of experiments.
+#
+#   python batch.py manifest.json -o layouts [-j 4] [--format npz|grid]
+#
+# manifest.json:
+#   {"plate": {"rows": 16, "columns": 24, "replicates": 3},
+#    "experiments": [
+#      {"id": "E1",
+#       "samples": [{"group": "Naive", "samples": ["N1", "N2"]},
+#                   {"group": "shRNA", "num": 8}],
+#       "assays": [{"assays": ["Tbp"], "ref": true},
+#                  {"assays": ["NaCT", "Gapdh"]}]}]}
+#
+# An experiment may carry its own "plate" settings.
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+import columnar
+import main3
+import planner
+
+PLATE = {'rows' : 8, 'columns' : 12, 'replicates' : 3}
+
+def experiment(spec):
+    exp = main3.Experiment(spec['id'])
+    for entry in spec.get('samples', []):
+        exp.addSamples(entry['group'], entry.get('samples'), entry.get('num', 8))
+    for entry in spec.get('assays', []):
+        exp.addAssays(entry['assays'], entry.get('ref', False))
+    return exp
+
+def run(job):
+    # one experiment, in a worker; takes and returns plain data only
+    spec, plate, output, kind = job
+    plate = dict(plate, **spec.get('plate', {}))
+    plates = planner.plan(experiment(spec), plate['rows'], plate['columns'], plate['replicates'])
+    if kind == 'grid':
+        path = os.path.join(output, spec['id'] + '.txt')
+        out = open(path, 'w')
+        try:
+            main3.writePlates(out, plates)
+        finally:
+            out.close()
+    else:
+        path = columnar.save(os.path.join(output, spec['id'] + '.npz'), plates)
+    return spec['id'], len(plates), path
+
+def encode(value):
+    # json gives unicode, the layouts and their file names use utf-8 bytes
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return dict((encode(key), encode(item)) for key, item in value.items())
+    return value
+
+def load(path):
+    manifest = encode(json.load(open(path)))
+    specs = manifest['experiments']
+    seen = set()
+    for spec in specs:
+        spec['id'] = main3.encodeName(spec['id'])
+        if spec['id'] in seen:
+            raise ValueError('duplicate experiment id: %s' % spec['id'])
+        seen.add(spec['id'])
+    return dict(PLATE, **manifest.get('plate', {})), specs
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Generate plate layouts for a manifest of experiments.')
+    parser.add_argument('manifest')
+    parser.add_argument('-o', '--output', default = 'layouts')
+    parser.add_argument('-j', '--jobs', type = int, default = None, help = 'worker processes (default: one per cpu)')
+    parser.add_argument('--chunksize', type = int, default = None, help = 'experiments handed to a worker at a time')
+    parser.add_argument('--format', choices = ('npz', 'grid'), default = 'npz')
+    args = parser.parse_args(argv)
+
+    plate, specs = load(args.manifest)
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    jobs = [(spec, plate, args.output, args.format) for spec in specs]
+    start = time.time()
+    if args.jobs == 1:
+        results = map(run, jobs)
+    else:
+        pool = Pool(args.jobs)
+        try:
+            chunksize = args.chunksize or max(1, len(jobs) // (4 * (args.jobs or cpu_count())))
+            # imap keeps manifest order whatever finishes first
+            results = list(pool.imap(run, jobs, chunksize))
+        finally:
+            pool.close()
+            pool.join()
+    elapsed = time.time() - start
+    n_plates = 0
+    for ID, n, path in results:
+        print '%s\t%d plates\t%s' % (ID, n, path)
+        n_plates += n
+    print '%d experiments, %d plates in %.2f s (%.1f plates/s)' % (
+        len(results), n_plates, elapsed, n_plates / elapsed if elapsed else 0)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# Bytes per well of the model, against the dict-backed layout it replaced.
+#
+#   python benchmarks/bench_memory.py [n_rows n_columns]
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import model
+
+class DictWell(object):
+    # model.Well as it was before __slots__
+    def __init__(self, address, plate):
+        self.address = address
+        self.omit = False
+        self.plate = plate
+        self.samples = set()
+        self.detectors = set()
+
+def wellBytes(well):
+    size = sys.getsizeof(well)
+    if hasattr(well, '__dict__'):
+        size += sys.getsizeof(well.__dict__)
+    return size + sys.getsizeof(well.samples) + sys.getsizeof(well.detectors)
+
+def measure(plate, make_well):
+    wells = [make_well(address, plate) for address in plate.codec.names]
+    for n, well in enumerate(wells):
+        well.samples.add(n % 40)
+        well.detectors.add(n % 3)
+    return sum(wellBytes(well) for well in wells) / float(len(wells))
+
+def main(n_rows = 32, n_columns = 48):
+    plate = model.Plate('bench', n_rows, n_columns)
+    before = measure(plate, DictWell)
+    after = measure(plate, model.Well)
+    print '%d wells' % (n_rows * n_columns)
+    print 'before: %7.1f bytes/well' % before
+    print 'after:  %7.1f bytes/well' % after
+    print 'saved:  %6.1f%%' % (100.0 * (before - after) / before)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# Plates and planning time for a large experiment.
+#
+#   python benchmarks/bench_planner.py [n_samples n_targets n_refs replicates n_rows n_columns]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import main3
+import planner
+
+def main(n_samples = 10000, n_targets = 6, n_refs = 2, replicates = 3, n_rows = 16, n_columns = 24):
+    experiment = main3.Experiment('bench')
+    for group in range(0, n_samples, 100):
+        experiment.addSamples('g%d' % group, num = min(100, n_samples - group))
+    experiment.addAssays(['T%d' % n for n in range(n_targets)])
+    experiment.addAssays(['R%d' % n for n in range(n_refs)], isRef = True)
+    start = time.time()
+    plates = planner.plan(experiment, n_rows, n_columns, replicates)
+    elapsed = time.time() - start
+    print '%d combinations (%d wells)' % (n_samples * (n_targets + n_refs),
+                                         n_samples * (n_targets + n_refs) * replicates)
+    print '%d plates of %d wells, lower bound %d' % (len(plates), n_rows * n_columns,
+                                                     planner.lowerBound(experiment, n_rows, n_columns, replicates))
+    print '%.2f s, %.0f plates/s' % (elapsed, len(plates) / elapsed)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Throughput of the raw-data importer on a synthetic results export.
+#
+#   python benchmarks/bench_rawdata.py [megabytes [n_rows n_columns]]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import main3
+import model
+import rawdata
+
+TARGETS = ['Tbp', 'NaCT', 'Gapdh', 'Actb']
+
+def writeExport(path, megabytes, codec):
+    # instrument style preamble, then one row per well and target
+    random.seed(0)
+    out = open(path, 'wb')
+    out.write('* Block Type = 384-Well Block\n* Experiment Name = bench\n\n[Results]\n')
+    out.write('Well\tWell Position\tSample Name\tTarget Name\tCT\n')
+    limit = megabytes * 1024 * 1024
+    n = 0
+    while out.tell() < limit:
+        idx = n % len(codec.names)
+        ct = 'Undetermined' if random.random() < 0.02 else '%.3f' % random.uniform(15, 38)
+        out.write('%d\t%s\tS%d\t%s\t%s\n' % (idx + 1, codec.names[idx], idx % 40,
+                                           TARGETS[(n // len(codec.names)) % len(TARGETS)], ct))
+        n += 1
+    out.close()
+
+def timed(label, size, func):
+    start = time.time()
+    stats = func()
+    elapsed = time.time() - start
+    rows = stats['rows'] if stats else 0
+    print '%-8s %8.1f MB/s %10.0f rows/s' % (label, size / elapsed / 1e6, rows / elapsed)
+
+def records(path):
+    stream = open(path, 'rb')
+    stats = {'rows' : sum(1 for record in rawdata.readRecords(stream))}
+    stream.close()
+    return stats
+
+def main(megabytes = 64, n_rows = 16, n_columns = 24):
+    plate = model.Plate('bench', n_rows, n_columns)
+    fd, path = tempfile.mkstemp(suffix = '.txt')
+    os.close(fd)
+    try:
+        writeExport(path, megabytes, plate.codec)
+        size = os.path.getsize(path)
+        print '%.1f MB export, %d wells' % (size / 1e6, n_rows * n_columns)
+        timed('parse', size, lambda: records(path))
+        timed('model', size, lambda: rawdata.loadWells(plate, path))
+        timed('main3', size, lambda: rawdata.loadLayers(main3.Plate('bench', n_rows, n_columns), path))
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
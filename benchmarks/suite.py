@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Core plate operations of main3 and the model on 96, 384 and 1536 well plates.
+#
+#   python benchmarks/suite.py [-o results.json] [-b baseline.json] [-t 0.25] [-k pattern]
+#
+# Prints the best time per operation, writes them as JSON with -o and, given
+# a baseline, exits 1 when any operation is slower by more than the threshold.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np
+import main3
+import model
+
+GEOMETRIES = ((8, 12), (16, 24), (32, 48))
+
+def samplesFor(n_wells):
+    # 4 detectors x 3 replicates per sample
+    return max(1, n_wells // 12)
+
+def main3Cases(n_rows, n_columns):
+    names = ['s%d' % n for n in range(samplesFor(n_rows * n_columns))]
+    assays = ['Tbp', 'NaCT', 'Gapdh', 'Actb']
+    plate = main3.Plate('bench', n_rows, n_columns)
+    full = main3.Range(plate, (0, 0), (n_rows - 1, n_columns - 1))
+    full.autoFill('s', names, nrow = 4, ncol = 1)
+    full.autoFill('a', assays, nrow = 1, ncol = 3)
+    half = main3.Range(plate, (0, 0), (n_rows // 2 - 1, n_columns - 1))
+    scratch = plate.clone()
+    return [('plate', lambda: main3.Plate('bench', n_rows, n_columns)),
+            ('range', lambda: main3.Range(plate, (0, 0), (n_rows - 1, n_columns - 1))),
+            ('autoFill', lambda: full.autoFill('s', names, nrow = 4, ncol = 1)),
+            ('copy', lambda: half.copy((n_rows // 2, 0))),
+            ('clear', lambda: main3.Range(scratch, (0, 0), (n_rows - 1, n_columns - 1)).clearall()),
+            ('str', lambda: str(plate))]
+
+def modelCases(n_rows, n_columns):
+    catalog = model.Catalog()
+    samples = catalog.newSamples('bench', ['s%d' % n for n in range(samplesFor(n_rows * n_columns))])
+    detectors = catalog.newDetectors(['Tbp', 'NaCT', 'Gapdh', 'Actb'])
+    plate = model.Plate('bench', n_rows, n_columns)
+    first = plate.getWellAt(0, 0)
+    last = plate.getWellAt(n_rows - 1, n_columns - 1)
+    full = model.Range(first, last)
+    full.autoFill('detector', detectors, n_row = 1, n_column = 3)
+    full.autoFill('sample', samples, n_row = 4, n_column = 1)
+    half = model.Range(first, plate.getWellAt(n_rows // 2 - 1, n_columns - 1))
+    lower = model.Range(plate.getWellAt(n_rows // 2, 0), last)
+    scratch = model.Plate('scratch', n_rows, n_columns)
+    return [('plate', lambda: model.Plate('bench', n_rows, n_columns)),
+            ('range', lambda: model.Range(first, last)),
+            ('autoFill', lambda: full.autoFill('sample', samples, n_row = 4, n_column = 1)),
+            ('copy', lambda: half.copyTo(lower)),
+            ('clear', lambda: model.Range(scratch.getWellAt(0, 0),
+                                          scratch.getWellAt(n_rows - 1, n_columns - 1)).clear()),
+            ('str', lambda: full.show('sample'))]
+
+def best(func, repeat, budget):
+    # best of `repeat` rounds, each long enough to time reliably
+    number = 1
+    while True:
+        start = time.time()
+        for n in range(number):
+            func()
+        elapsed = time.time() - start
+        if elapsed >= budget or number >= 1 << 20:
+            break
+        number *= 2
+    times = [elapsed / number]
+    for r in range(repeat - 1):
+        start = time.time()
+        for n in range(number):
+            func()
+        times.append((time.time() - start) / number)
+    return min(times)
+
+def run(pattern = None, repeat = 5, budget = 0.05):
+    results = {}
+    for flavour, cases in (('main3', main3Cases), ('model', modelCases)):
+        for n_rows, n_columns in GEOMETRIES:
+            for name, func in cases(n_rows, n_columns):
+                key = '%s.%s.%d' % (flavour, name, n_rows * n_columns)
+                if pattern and pattern not in key:
+                    continue
+                results[key] = best(func, repeat, budget)
+                print '%-24s %12.1f us' % (key, results[key] * 1e6)
+                sys.stdout.flush()
+    return results
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        ratio = results[key] / baseline[key]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print '%-24s %12.1f us %7.2fx%s' % (key, results[key] * 1e6, ratio, flag)
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark core plate operations.')
+    parser.add_argument('-o', '--output', help = 'write results to this JSON file')
+    parser.add_argument('-b', '--baseline', help = 'JSON results to compare against')
+    parser.add_argument('-t', '--threshold', type = float, default = 0.25,
+                        help = 'allowed slowdown against the baseline (default 0.25)')
+    parser.add_argument('-k', '--pattern', help = 'only run operations whose name contains this')
+    parser.add_argument('-r', '--repeat', type = int, default = 5)
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeat)
+    if args.output:
+        out = open(args.output, 'w')
+        json.dump({'python' : platform.python_version(),
+                   'numpy' : np.__version__,
+                   'machine' : platform.platform(),
+                   'results' : results}, out, indent = 1, sort_keys = True)
+        out.close()
+    if args.baseline:
+        print
+        print 'against %s:' % args.baseline
+        regressions = compare(results, json.load(open(args.baseline))['results'], args.threshold)
+        if regressions:
+            print '%d regression(s) over %d%%' % (len(regressions), args.threshold * 100)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Rectangles are (row, col, nrow, ncol) tuples.
+
+def intersect(a, b):
+    row = max(a[0], b[0])
+    col = max(a[1], b[1])
+    nrow = min(a[0] + a[2], b[0] + b[2]) - row
+    ncol = min(a[1] + a[3], b[1] + b[3]) - col
+    if nrow <= 0 or ncol <= 0:
+        return None
+    return (row, col, nrow, ncol)
+
+def difference(a, b):
+    # a minus b as at most four strips: full-width above/below, then left/right
+    common = intersect(a, b)
+    if common is None:
+        return [a] if a[2] > 0 and a[3] > 0 else []
+    strips = []
+    if common[0] > a[0]:
+        strips.append((a[0], a[1], common[0] - a[0], a[3]))
+    if common[0] + common[2] < a[0] + a[2]:
+        strips.append((common[0] + common[2], a[1], a[0] + a[2] - common[0] - common[2], a[3]))
+    if common[1] > a[1]:
+        strips.append((common[0], a[1], common[2], common[1] - a[1]))
+    if common[1] + common[3] < a[1] + a[3]:
+        strips.append((common[0], common[1] + common[3], common[2], a[1] + a[3] - common[1] - common[3]))
+    return strips
+
+def transfer(src, dst_pos, src_shape, dst_shape = None):
+    # Clip a block copy of src to dst_pos so both ends fit their plates.
+    # Returns the clipped (src, dst) rectangles, or None if nothing fits.
+    if dst_shape is None:
+        dst_shape = src_shape
+    src = intersect(src, (0, 0) + tuple(src_shape))
+    if src is None:
+        return None
+    drow = dst_pos[0] - src[0]
+    dcol = dst_pos[1] - src[1]
+    dst = intersect((dst_pos[0], dst_pos[1], src[2], src[3]), (0, 0) + tuple(dst_shape))
+    if dst is None:
+        return None
+    src = (dst[0] - drow, dst[1] - dcol, dst[2], dst[3])
+    return src, dst
+
+def order(src_start, dst_start, n):
+    # memmove direction: walk backwards when the destination lies ahead
+    if dst_start > src_start:
+        return range(n - 1, -1, -1)
+    return range(n)
+
+def cells(src, dst):
+    # (src_cell, dst_cell) pairs in an order that never overwrites a
+    # source cell before it has been read, even when src and dst overlap
+    for r in order(src[0], dst[0], src[2]):
+        for c in order(src[1], dst[1], src[3]):
+            yield (src[0] + r, src[1] + c), (dst[0] + r, dst[1] + c)
+
+class Selection(object):
+    # Rubber-band rectangle kept as an anchor and a moving corner. start,
+    # extend and clear return the strips whose selected state changed.
+    def __init__(self):
+        self.anchor = None
+        self.corner = None
+
+    def isActive(self):
+        return self.anchor is not None
+
+    def rect(self):
+        if self.anchor is None:
+            return None
+        row = min(self.anchor[0], self.corner[0])
+        col = min(self.anchor[1], self.corner[1])
+        return (row, col,
+                abs(self.anchor[0] - self.corner[0]) + 1,
+                abs(self.anchor[1] - self.corner[1]) + 1)
+
+    def contains(self, row, col):
+        if self.anchor is None:
+            return False
+        return (min(self.anchor[0], self.corner[0]) <= row <= max(self.anchor[0], self.corner[0]) and
+                min(self.anchor[1], self.corner[1]) <= col <= max(self.anchor[1], self.corner[1]))
+
+    def _change(self, anchor, corner):
+        old = self.rect()
+        self.anchor = anchor
+        self.corner = corner
+        new = self.rect()
+        if old is None:
+            return [new] if new else []
+        if new is None:
+            return [old]
+        return difference(old, new) + difference(new, old)
+
+    def start(self, pos):
+        return self._change(pos, pos)
+
+    def extend(self, pos):
+        if self.anchor is None:
+            return self.start(pos)
+        return self._change(self.anchor, pos)
+
+    def clear(self):
+        return self._change(None, None)
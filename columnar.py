@@ -0,0 +1,194 @@
+import os
+import zipfile
+from StringIO import StringIO
+import numpy as np
+import main3
+import model
+
+# one row per well (main3) or per well, sample and detector (model); the
+# vocabularies are stored once and the row columns hold codes into them
+COLUMNS = ('plate', 'row', 'col', 'sample', 'assay', 'value', 'omit')
+
+def _strings(items):
+    return np.array([main3.encodeName(item) for item in items], dtype = str)
+
+def _remap(codes, lut):
+    # lut[-1] is NA_CODE so NA stays NA
+    return np.append(np.asarray(lut, dtype = np.int32), main3.NA_CODE)[codes]
+
+def _arrayRows(plate, plate_code, vocab):
+    rows, cols = np.indices(plate.get_layer('v').shape)
+    lut = dict((item_class, [vocab[item_class].encode(item) for item in plate.vocabulary(item_class).items()])
+               for item_class in 'sa')
+    return {'plate' : np.full(rows.size, plate_code, dtype = np.int32),
+            'row' : rows.ravel().astype(np.int32),
+            'col' : cols.ravel().astype(np.int32),
+            'sample' : _remap(plate.get_layer('s').ravel(), lut['s']),
+            'assay' : _remap(plate.get_layer('a').ravel(), lut['a']),
+            'value' : plate.get_layer('v').ravel(),
+            'omit' : np.zeros(rows.size, dtype = bool)}
+
+def _wellRows(plate, plate_code, vocab, groups):
+    rows = dict((name, []) for name in COLUMNS)
+    for n, address in enumerate(plate.codec.names):
+        well = plate.wells[address]
+        samples = sorted(well.samples, key = model.Sample.getName) or [None]
+        detectors = sorted(well.detectors, key = model.Detector.getName) or [None]
+        for sample in samples:
+            if sample is None:
+                sample_code = main3.NA_CODE
+            else:
+                sample_code = vocab['s'].encode(sample.getName())
+                if sample_code == len(groups):
+                    groups.append(main3.NA_CODE)
+                # the name may have come first from a main3 plate, which has no groups
+                if groups[sample_code] == main3.NA_CODE and sample.getGroup() is not None:
+                    groups[sample_code] = vocab['g'].encode(sample.getGroup().getName())
+            for detector in detectors:
+                value = well.getValue(detector) if detector else None
+                rows['plate'].append(plate_code)
+                rows['row'].append(n // plate.n_columns)
+                rows['col'].append(n % plate.n_columns)
+                rows['sample'].append(sample_code)
+                rows['assay'].append(vocab['a'].encode(detector.getName()) if detector else main3.NA_CODE)
+                rows['value'].append(np.nan if value is None else float(value))
+                rows['omit'].append(well.omit)
+    return {'plate' : np.array(rows['plate'], dtype = np.int32),
+            'row' : np.array(rows['row'], dtype = np.int32),
+            'col' : np.array(rows['col'], dtype = np.int32),
+            'sample' : np.array(rows['sample'], dtype = np.int32),
+            'assay' : np.array(rows['assay'], dtype = np.int32),
+            'value' : np.array(rows['value'], dtype = np.float64),
+            'omit' : np.array(rows['omit'], dtype = bool)}
+
+def table(plates):
+    # main3.Plate and model.Plate can be mixed
+    vocab = {'p' : main3.Vocabulary(), 's' : main3.Vocabulary(),
+             'g' : main3.Vocabulary(), 'a' : main3.Vocabulary()}
+    groups = []
+    shapes = []
+    parts = []
+    for plate in plates:
+        if isinstance(plate, main3.Plate):
+            code = vocab['p'].encode(plate._id)
+            shapes.append((plate._nrow, plate._ncol))
+            parts.append(_arrayRows(plate, code, vocab))
+            groups.extend([main3.NA_CODE] * (len(vocab['s']) - len(groups)))
+        else:
+            code = vocab['p'].encode(plate.getName())
+            shapes.append((plate.n_rows, plate.n_columns))
+            parts.append(_wellRows(plate, code, vocab, groups))
+        if code <> len(shapes) - 1:
+            raise ValueError('duplicate plate id: %r' % (vocab['p'].decode(code),))
+    columns = dict((name, np.concatenate([part[name] for part in parts]) if parts
+                    else np.zeros(0, dtype = np.int32)) for name in COLUMNS)
+    columns.update({'plates' : _strings(vocab['p'].items()),
+                    'plate_shape' : np.array(shapes, dtype = np.int32).reshape(-1, 2),
+                    'samples' : _strings(vocab['s'].items()),
+                    'sample_group' : np.array(groups, dtype = np.int32),
+                    'groups' : _strings(vocab['g'].items()),
+                    'assays' : _strings(vocab['a'].items())})
+    return columns
+
+def save(path, plates):
+    # path.npz for a single file, anything else is a directory of .npy files
+    # that load() can memory-map
+    columns = table(plates)
+    if path.endswith('.npz'):
+        # same bytes for the same plates, unlike np.savez which stamps the time
+        archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64 = True)
+        try:
+            for name in sorted(columns):
+                data = StringIO()
+                np.lib.format.write_array(data, columns[name])
+                archive.writestr(zipfile.ZipInfo(name + '.npy', (1980, 1, 1, 0, 0, 0)), data.getvalue())
+        finally:
+            archive.close()
+        return path
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for name, column in columns.items():
+        np.save(os.path.join(path, name + '.npy'), column)
+    return path
+
+def load(path, mmap_mode = 'r'):
+    # columns by name; .npy directories are memory-mapped, not copied
+    if path.endswith('.npz'):
+        archive = np.load(path)
+        try:
+            return dict((name, archive[name]) for name in archive.files)
+        finally:
+            archive.close()
+    return dict((name[:-4], np.load(os.path.join(path, name), mmap_mode = mmap_mode))
+                for name in os.listdir(path) if name.endswith('.npy'))
+
+def _plateRows(columns):
+    plate = np.asarray(columns['plate'])
+    order = np.argsort(plate, kind = 'mergesort')
+    bounds = np.searchsorted(plate[order], np.arange(len(columns['plates']) + 1))
+    for code in range(len(columns['plates'])):
+        yield code, order[bounds[code]:bounds[code + 1]]
+
+def toPlates(columns):
+    # main3.Plate per plate id, each with only the vocabulary it uses
+    plates = []
+    for code, rows in _plateRows(columns):
+        nrow, ncol = map(int, columns['plate_shape'][code])
+        plate = main3.Plate(str(columns['plates'][code]), nrow, ncol)
+        r = columns['row'][rows]
+        c = columns['col'][rows]
+        for item_class, name, vocabulary in (('s', 'sample', 'samples'), ('a', 'assay', 'assays')):
+            codes = columns[name][rows]
+            used = np.unique(codes[codes >= 0])
+            lut = np.full(len(columns[vocabulary]), main3.NA_CODE, dtype = np.int32)
+            lut[used] = plate.vocabulary(item_class).encodeArray(columns[vocabulary][used])
+            layer = plate.get_layer(item_class)
+            layer[r, c] = _remap(codes, lut)
+            plate.set_layer(item_class, layer, encoded = True)
+        layer = plate.get_layer('v')
+        layer[r, c] = columns['value'][rows]
+        plate.set_layer('v', layer)
+        plates.append(plate)
+    return plates
+
+def toModel(columns, catalog = None):
+    # model.Plate per plate id; samples and detectors come from catalog,
+    # unknown names are created in it
+    if catalog is None:
+        catalog = model.Catalog()
+    groups = columns['groups'].tolist()
+    samples = []
+    for code, name in enumerate(columns['samples'].tolist()):
+        sample = catalog.getSample(name)
+        if sample is None:
+            group = columns['sample_group'][code]
+            sample = model.Sample(name)
+            catalog.addSample(sample, groups[group] if group >= 0 else None)
+        samples.append(sample)
+    detectors = []
+    for name in columns['assays'].tolist():
+        detector = catalog.getDetector(name)
+        if detector is None:
+            detector = model.Detector(name)
+            catalog.addDetector(detector)
+        detectors.append(detector)
+    plates = []
+    for code, rows in _plateRows(columns):
+        nrow, ncol = map(int, columns['plate_shape'][code])
+        plate = model.Plate(str(columns['plates'][code]), nrow, ncol)
+        for n in rows:
+            well = plate.getWellAt(columns['row'][n], columns['col'][n])
+            sample = columns['sample'][n]
+            if sample >= 0 and samples[sample] not in well.samples:
+                well.addSample(samples[sample])
+            detector = columns['assay'][n]
+            if detector >= 0:
+                if detectors[detector] not in well.detectors:
+                    well.addDetector(detectors[detector])
+                value = columns['value'][n]
+                if not np.isnan(value):
+                    well.setValue(detectors[detector], float(value))
+            if columns['omit'][n]:
+                well.exclude()
+        plates.append(plate)
+    return plates, catalog
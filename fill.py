@@ -0,0 +1,29 @@
+import numpy as np
+
+UNFILLED = -1
+
+ROW_WISE = ('row-wise', 1)
+COL_WISE = ('col-wise', 2)
+
+def indexMap(nrow, ncol, block_nrow, block_ncol, direction, iteration, index, n_items):
+    # Item index of every cell of an nrow x ncol range filled with
+    # block_nrow x block_ncol blocks, as Range.autoFill walks them.
+    # Cells left over past the last whole block are UNFILLED.
+    # Returns the map and the index the next fill should start from.
+    nROW = nrow // block_nrow
+    nCOL = ncol // block_ncol
+    R_idx = np.arange(nROW * block_nrow) // block_nrow
+    C_idx = np.arange(nCOL * block_ncol) // block_ncol
+    if direction in ROW_WISE:
+        block = C_idx[np.newaxis, :] * nROW + R_idx[:, np.newaxis]
+    elif direction in COL_WISE:
+        block = R_idx[:, np.newaxis] * nCOL + C_idx[np.newaxis, :]
+    else:
+        raise ValueError('unknown fill direction: %r' % (direction,))
+    index_map = np.full((nrow, ncol), UNFILLED, dtype = np.intp)
+    if iteration:
+        index_map[:nROW * block_nrow, :nCOL * block_ncol] = (index + block) % n_items
+        index += nROW * nCOL
+    else:
+        index_map[:nROW * block_nrow, :nCOL * block_ncol] = index % n_items
+    return index_map, index % n_items
@@ -0,0 +1,177 @@
+import glob
+import os
+from multiprocessing import Pool
+import numpy as np
+import main3
+from addressing import ROW_NAMES, COLUMN_NAMES
+
+# block labels written by main3.Plate.__str__ and model.writePlates; groups
+# and addresses have no main3 layer and are read past
+LAYERS = {'samples' : 's', 'assays' : 'a', 'detectors' : 'a', 'values' : 'v',
+          'groups' : None, 'addresses' : None}
+
+_ROWS = dict((name, n) for n, name in enumerate(ROW_NAMES))
+_COLUMNS = dict((name, n) for n, name in enumerate(COLUMN_NAMES))
+
+class GridError(Exception):
+    pass
+
+def _cell(field):
+    # Range.show terminates every name with ';'
+    field = field.strip()
+    if field.endswith(';'):
+        field = field[:-1]
+    return field or main3.NA
+
+def _value(cell):
+    # main3 writes the number, model 'detector:value' for each detector
+    entries = cell.split(';')
+    if len(entries) > 1:
+        raise GridError('%r holds several values, a main3 well holds one' % cell)
+    value = entries[0].rpartition(':')[2]
+    if value == 'None':
+        return np.nan
+    try:
+        return main3._toValue(value)
+    except ValueError:
+        raise GridError('bad value %r' % cell)
+
+def _grids(grids):
+    return [(layer, row, col, np.array(cells, dtype = object))
+            for layer, row, col, cells in grids if cells and layer is not None]
+
+def parseAll(lines, item_class = 's'):
+    # -> (ID, [(item_class, row, col, cells)]) per plate, cells a 2D object
+    # array anchored at (row, col); every 'ID:' line starts a plate and grids
+    # without a label (Range.show) go to item_class
+    default = item_class
+    ID = None
+    grids = []
+    columns = None
+    # a 'name:' line is only known to be a layer label or a plate ID once the
+    # next line is read: writers put the layer label right after 'ID:', so a
+    # label followed by another label is an ID, whatever its name
+    pending = None
+    labelled = False
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            columns = None
+            continue
+        fields = line.split('\t')
+        is_label = len(fields) == 1 and line.endswith(':')
+        if pending is not None:
+            if is_label or pending.lower() not in LAYERS:
+                if ID is not None or grids:
+                    yield ID, _grids(grids)
+                ID = pending
+                grids = []
+                item_class = default
+                labelled = False
+            elif grids and not labelled:
+                raise GridError('%r after unlabelled grids could be a plate ID or a layer label' % pending)
+            else:
+                item_class = LAYERS[pending.lower()]
+                labelled = True
+            pending = None
+        if is_label:
+            pending = line[:-1].strip()
+            columns = None
+        elif fields[0] == '':
+            names = [name.strip() for name in fields[1:]]
+            while names and not names[-1]:
+                names.pop()
+            try:
+                columns = [_COLUMNS[name] for name in names]
+            except KeyError, error:
+                raise GridError('bad column name %s' % error)
+            if not columns or columns <> range(columns[0], columns[0] + len(columns)):
+                raise GridError('columns are not contiguous: %s' % line)
+            grids.append([item_class, None, columns[0], []])
+        elif columns is not None:
+            grid = grids[-1]
+            row = _ROWS.get(fields[0].strip().upper())
+            if row is None:
+                raise GridError('bad row name %r' % fields[0])
+            if grid[1] is None:
+                grid[1] = row
+            elif row <> grid[1] + len(grid[3]):
+                raise GridError('rows are not contiguous at %s' % fields[0])
+            cells = [_cell(field) for field in fields[1:1 + len(columns)]]
+            cells += [main3.NA] * (len(columns) - len(cells))
+            grid[3].append(cells)
+        else:
+            raise GridError('unexpected line: %s' % line)
+    if pending is not None:
+        # a last label with no grid after it is an empty plate
+        if ID is not None or grids:
+            yield ID, _grids(grids)
+        ID, grids = pending, []
+    if ID is not None or grids:
+        yield ID, _grids(grids)
+
+def parse(lines, item_class = 's'):
+    # a single plate
+    plates = list(parseAll(lines, item_class))
+    if len(plates) > 1:
+        raise GridError('%d plates where one was expected' % len(plates))
+    return plates[0] if plates else (None, [])
+
+def parseFile(path, item_class = 's'):
+    # every plate in the file, the first named after the file if it has no ID
+    stream = open(path, 'rU')
+    try:
+        plates = list(parseAll(stream, item_class))
+    finally:
+        stream.close()
+    if plates and plates[0][0] is None:
+        plates[0] = (os.path.splitext(os.path.basename(path))[0], plates[0][1])
+    return plates
+
+def _parseFile(args):
+    return parseFile(*args)
+
+def build(ID, grids, nrow = None, ncol = None):
+    # plate just large enough for the grids unless a shape is given
+    if nrow is None:
+        nrow = max([row + cells.shape[0] for layer, row, col, cells in grids] or [0])
+    if ncol is None:
+        ncol = max([col + cells.shape[1] for layer, row, col, cells in grids] or [0])
+    plate = main3.Plate(ID, nrow, ncol)
+    for item_class, row, col, cells in grids:
+        if row + cells.shape[0] > nrow or col + cells.shape[1] > ncol:
+            raise GridError('%s grid at %s does not fit a %dx%d plate'
+                            % (ID, ROW_NAMES[row] + COLUMN_NAMES[col], nrow, ncol))
+        layer = plate.get_layer(item_class)
+        if item_class == 'v':
+            layer[row:row + cells.shape[0], col:col + cells.shape[1]] = \
+                [[_value(cell) for cell in line] for line in cells]
+        else:
+            layer[row:row + cells.shape[0], col:col + cells.shape[1]] = \
+                plate.vocabulary(item_class).encodeArray(cells)
+        plate.set_layer(item_class, layer, encoded = True)
+    return plate
+
+def load(path, item_class = 's', nrow = None, ncol = None):
+    # list of the plates in one file
+    return [build(ID, grids, nrow, ncol) for ID, grids in parseFile(path, item_class)]
+
+def loadAll(paths, item_class = 's', nrow = None, ncol = None, processes = 1):
+    # text parsing runs in the pool (processes = None for one per cpu),
+    # plates are built here from plain arrays
+    paths = list(paths)
+    args = [(path, item_class) for path in paths]
+    if processes == 1 or len(paths) < 2:
+        parsed = map(_parseFile, args)
+    else:
+        pool = Pool(processes)
+        try:
+            parsed = pool.map(_parseFile, args)
+        finally:
+            pool.close()
+            pool.join()
+    return [build(ID, grids, nrow, ncol) for plates in parsed for ID, grids in plates]
+
+def loadDirectory(directory, pattern = '*.txt', item_class = 's', nrow = None, ncol = None, processes = 1):
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    return loadAll(paths, item_class, nrow, ncol, processes)
@@ -0,0 +1,144 @@
+import cProfile
+import functools
+import logging
+import logging.handlers
+import math
+import sys
+import time
+
+# Counters and latency histograms for named operations. Everything is off
+# until enable(); a disabled timed() wrapper costs one flag test.
+
+enabled = False
+slow = None
+capture = None
+log = logging.getLogger('plate_editer.instrument')
+log.propagate = False
+
+class Stats(object):
+    __slots__ = ('count', 'total', 'worst', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        # buckets[n] counts calls taking [2**(n-1), 2**n) microseconds
+        self.buckets = {}
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.worst:
+            self.worst = elapsed
+        bucket = math.frexp(elapsed * 1e6)[1] if elapsed > 0 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        # upper edge of the bucket holding that fraction of the calls
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.count:
+                return min(2 ** bucket / 1e6, self.worst)
+        return self.worst
+
+stats = {}
+counters = {}
+
+def enable(log_path = None, max_bytes = 1 << 20, backups = 3, slow_ms = None):
+    # log_path: rolling log of dumps and of calls slower than slow_ms
+    global enabled, slow
+    enabled = True
+    slow = slow_ms / 1000.0 if slow_ms is not None else None
+    if log_path:
+        for handler in log.handlers[:]:
+            log.removeHandler(handler)
+            handler.close()
+        handler = logging.handlers.RotatingFileHandler(log_path, maxBytes = max_bytes, backupCount = backups)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    stats.clear()
+    counters.clear()
+
+def count(name, n = 1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+def record(name, elapsed):
+    entry = stats.get(name)
+    if entry is None:
+        entry = stats[name] = Stats()
+    entry.add(elapsed)
+    if slow is not None and elapsed >= slow and log.handlers:
+        log.info('slow %s %.1f ms', name, elapsed * 1000)
+
+def captureNext(path):
+    # cProfile the next gesture (a timed(..., gesture = True) call) into path
+    global capture
+    capture = path
+
+def _profile(name, func, args, kwargs):
+    global capture
+    path, capture = capture, None
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        profile.dump_stats(path)
+        if log.handlers:
+            log.info('profiled %s into %s', name, path)
+
+def timed(name, gesture = False):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.time()
+            try:
+                if gesture and capture is not None:
+                    return _profile(name, func, args, kwargs)
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.time() - start)
+        return wrapper
+    return decorate
+
+def report():
+    lines = ['%-28s %8s %10s %9s %9s %9s' % ('operation', 'calls', 'total ms', 'mean us', 'p95 us', 'max us')]
+    for name in sorted(stats):
+        entry = stats[name]
+        lines.append('%-28s %8d %10.1f %9.1f %9.0f %9.0f' % (
+            name, entry.count, entry.total * 1e3, entry.total / entry.count * 1e6,
+            entry.percentile(0.95) * 1e6, entry.worst * 1e6))
+    for name in sorted(counters):
+        lines.append('%-28s %8d' % (name, counters[name]))
+    return '\n'.join(lines)
+
+def histogram(name, width = 40):
+    entry = stats.get(name)
+    if entry is None:
+        return name + ': no calls'
+    lines = [name + ':']
+    peak = max(entry.buckets.values())
+    for bucket in sorted(entry.buckets):
+        n = entry.buckets[bucket]
+        lines.append('  < %9d us %7d %s' % (2 ** bucket, n, '#' * max(1, n * width // peak)))
+    return '\n'.join(lines)
+
+def dump(out = None, histograms = False):
+    # to out (stderr by default) and to the rolling log when there is one
+    text = report()
+    if histograms:
+        text += '\n' + '\n'.join(histogram(name) for name in sorted(stats))
+    (out or sys.stderr).write(text + '\n')
+    if log.handlers:
+        log.info('\n' + text)
+    return text
@@ -0,0 +1,225 @@
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+class _LayerDelta(object):
+    # cells of one main3.Plate layer that an edit changed, with the values
+    # they held on the other side of it
+    def __init__(self, layer, index, values):
+        self.layer = layer
+        self.index = index
+        self.values = values
+        self.nbytes = index.nbytes + values.nbytes
+
+    def swap(self):
+        current = self.layer.flat[self.index]
+        self.layer.flat[self.index] = self.values
+        self.values = current
+
+class _LayerSnapshot(object):
+    def __init__(self, plate, item_class, rect):
+        self.layers = [plate._layer(layer_class) for layer_class in (item_class or 'sav')]
+        self.rect = rect
+        self.before = [layer[self._block()].copy() for layer in self.layers]
+
+    def _block(self):
+        row, col, nrow, ncol = self.rect
+        return slice(row, row + nrow), slice(col, col + ncol)
+
+    def deltas(self):
+        row, col, nrow, ncol = self.rect
+        rows, cols = np.indices((nrow, ncol))
+        flat = (rows + row) * self.layers[0].shape[1] + (cols + col)
+        for layer, before in zip(self.layers, self.before):
+            after = layer[self._block()]
+            changed = before <> after
+            if before.dtype.kind == 'f':
+                changed &= ~(np.isnan(before) & np.isnan(after))
+            if changed.any():
+                yield _LayerDelta(layer, flat[changed], before[changed])
+
+class _WellDelta(object):
+    # samples, detectors, values and omit flag of a model.Well
+    def __init__(self, well, state):
+        self.well = well
+        self.state = state
+        self.nbytes = 64 + 8 * (len(state[0]) + len(state[1]) + len(state[2] or ()))
+
+    @staticmethod
+    def capture(well):
+        return (frozenset(well.samples), frozenset(well.detectors),
+                dict(well.values) if well.values else None, well.omit)
+
+    def swap(self):
+        well = self.well
+        current = self.capture(well)
+        samples, detectors, values, omit = self.state
+        well.clearSamples()
+        for sample in samples:
+            well.addSample(sample)
+        well.clearDetectors()
+        for detector in detectors:
+            well.addDetector(detector)
+        well.values = dict(values) if values else None
+        well.omit = omit
+        well.resetValueLabels()
+        self.state = current
+
+class _WellSnapshot(object):
+    def __init__(self, wells):
+        self.before = [(well, _WellDelta.capture(well)) for well in set(wells)]
+
+    def deltas(self):
+        for well, before in self.before:
+            if _WellDelta.capture(well) <> before:
+                yield _WellDelta(well, before)
+
+class Entry(object):
+    def __init__(self, label):
+        self.label = label
+        self.deltas = []
+        self.nbytes = 0
+
+    def add(self, delta):
+        self.deltas.append(delta)
+        self.nbytes += delta.nbytes
+
+    def undo(self):
+        for delta in reversed(self.deltas):
+            delta.swap()
+
+    def redo(self):
+        for delta in self.deltas:
+            delta.swap()
+
+@contextmanager
+def _untracked():
+    yield
+
+class Journaled(object):
+    # undo plumbing shared by main3.Plate and model.Plate; journal stays None
+    # until Journal.attach, and _capture(journal, ...) is the plate's own
+    # snapshot of what an edit is about to change
+    journal = None
+
+    def transaction(self, label = None):
+        # one undo step for everything done inside
+        if self.journal is None:
+            return _untracked()
+        return self.journal.transaction(label)
+
+    def _snapshot(self, *args):
+        if self.journal is None:
+            return None
+        return self._capture(self.journal, *args)
+
+    def _commit(self, snapshot, label):
+        if snapshot is not None:
+            self.journal.commit(snapshot, label)
+
+class Journal(object):
+    # undo/redo of plate edits, oldest entries are dropped past max_bytes
+    def __init__(self, max_bytes = 16 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.entry = None
+        self.depth = 0
+        self.enabled = True
+
+    def attach(self, plate):
+        plate.journal = self
+        return self
+
+    def begin(self, label = None):
+        if self.depth == 0:
+            self.entry = Entry(label)
+        self.depth += 1
+        return self
+
+    def end(self):
+        self.depth -= 1
+        if self.depth == 0:
+            entry, self.entry = self.entry, None
+            if entry.deltas:
+                self._push(entry)
+        return self
+
+    @contextmanager
+    def transaction(self, label = None):
+        # edits inside are undone and redone as one step, e.g. a drag-fill
+        self.begin(label)
+        try:
+            yield self
+        finally:
+            self.end()
+
+    def snapshot(self, plate, item_class, rect):
+        # before an edit to rect of a main3.Plate (item_class None for all layers)
+        if not self.enabled or rect is None:
+            return None
+        return _LayerSnapshot(plate, item_class, rect)
+
+    def snapshotWells(self, wells):
+        # before an edit to some wells of a model.Plate
+        if not self.enabled:
+            return None
+        return _WellSnapshot(wells)
+
+    def commit(self, snapshot, label = None):
+        # after the edit, keeps what it actually changed
+        if snapshot is None:
+            return self
+        self.begin(label)
+        try:
+            for delta in snapshot.deltas():
+                self.entry.add(delta)
+        finally:
+            self.end()
+        return self
+
+    def _push(self, entry):
+        self.undo_stack.append(entry)
+        self.nbytes += entry.nbytes
+        for dropped in self.redo_stack:
+            self.nbytes -= dropped.nbytes
+        self.redo_stack = []
+        while self.nbytes > self.max_bytes and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft().nbytes
+
+    def _replay(self, entry, method):
+        # the swaps below must not be journaled themselves
+        self.enabled = False
+        try:
+            method(entry)
+        finally:
+            self.enabled = True
+
+    def canUndo(self):
+        return bool(self.undo_stack)
+
+    def canRedo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack or self.depth:
+            return None
+        entry = self.undo_stack.pop()
+        self._replay(entry, Entry.undo)
+        self.redo_stack.append(entry)
+        return entry.label
+
+    def redo(self):
+        if not self.redo_stack or self.depth:
+            return None
+        entry = self.redo_stack.pop()
+        self._replay(entry, Entry.redo)
+        self.undo_stack.append(entry)
+        return entry.label
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.nbytes = 0
+        return self
@@ -1,14 +1,14 @@
 #!/usr/bin/env python
-import string
 import wx
-ROW_NAMES = list(string.ascii_uppercase)
-COLUMN_NAMES = map(str, range(1, 100))
+import addressing
 
 class Sample(object):
+    __slots__ = ('name', 'group', 'wells')
+
     def __init__(self, name):
         self.name = name
         self.group = None
-        self.wells = []
+        self.wells = set()
         
     def getName(self):
         return self.name
@@ -18,6 +18,8 @@ class Sample(object):
     
     def setGroup(self, group):
         self.group = group
+        for well in self.wells:
+            well.resetGroupLabels()
         return self
         
     def getGroup(self):
@@ -43,16 +45,22 @@ class SampleList(object):
         return tmp
 
 class Group(object):
+    __slots__ = ('name', 'samples', 'members', 'names', 'treatment', 'control')
+
     def __init__(self, name):
         self.name = name
         self.samples = []
+        self.members = set()
+        self.names = {}
         self.treatment = {}
         self.control = False
         
     def addSample(self, sample):
-        if not sample in self.samples:
+        if not sample in self.members:
             self.samples.append(sample)
-            sample.group = self
+            self.members.add(sample)
+            self.names.setdefault(sample.getName(), sample)
+            sample.setGroup(self)
         return self
             
     def addSampleList(self, list_of_samples):
@@ -64,11 +72,7 @@ class Group(object):
         return self.name
     
     def getSample(self, sample_name):
-        for sample in self.samples:
-            if sample.getName() == sample_name:
-                return sample
-        else:
-            return None
+        return self.names.get(sample_name, None)
     
     def getSamples(self):
         return self.samples
@@ -81,17 +85,21 @@ class Group(object):
         return self.control
 
 class Detector(object):
+    __slots__ = ('name', 'value', 'control', 'wells')
+
     def __init__(self, name):
         self.name = name
         self.value = None
         self.control = False
-        self.wells = []
+        self.wells = set()
         
     def getName(self):
         return self.name
     
     def setValue(self, value):
         self.value = value
+        for well in self.wells:
+            well.resetValueLabels()
         return self
         
     def getValue(self):
@@ -101,6 +109,10 @@ class Detector(object):
         return self.control
     
 class Well(object):
+    __slots__ = ('address', 'omit', 'plate', 'up', 'down', 'left', 'right',
+                 'samples', 'detectors', 'ui',
+                 'sample_names', 'group_names', 'detector_names', 'detector_values')
+
     def __init__(self, address, plate):
         self.address = address
         self.omit = False
@@ -111,9 +123,11 @@ class Well(object):
         self.right = None
         self.samples = []
         self.detectors = []
+        self.resetSampleLabels()
+        self.resetDetectorLabels()
         self.ui = Well_ui(self.plate.ui, self.plate, self.address)
         
-    def omit(self):
+    def exclude(self):
         self.omit = True
         return self
     
@@ -144,43 +158,43 @@ class Well(object):
     def addSample(self, sample):
         if not sample in self.samples:
             self.samples.append(sample)
-        if not self in sample.wells:
-            sample.wells.append(self)
+        sample.wells.add(self)
+        self.resetSampleLabels()
         return self
     
     def addDetector(self, detector):
         if not detector in self.detectors:
             self.detectors.append(detector)
-        if not self in detector.wells:
-            detector.wells.append(self)
+        detector.wells.add(self)
+        self.resetDetectorLabels()
         return self
     
     def removeSample(self, sample):
         if self.samples.count(sample) == 1:
             self.samples.remove(sample)
-        if sample.wells.count(self) == 1:
-            sample.wells.remove(self)
+        sample.wells.discard(self)
+        self.resetSampleLabels()
         return self
     
     def removeDetector(self, detector):
         if self.detectors.count(detector) == 1:
             self.detectors.remove(detector)
-        if detector.wells.count(self) == 1:
-            detector.wells.remove(self)
+        detector.wells.discard(self)
+        self.resetDetectorLabels()
         return self
     
     def clearSamples(self):
         for sample in self.samples:
-            if sample.wells.count(self) == 1:
-                sample.wells.remove(self)
+            sample.wells.discard(self)
         self.samples = []
+        self.resetSampleLabels()
         return self
     
     def clearDetectors(self):
         for detector in self.detectors:
-            if detector.wells.count(self) == 1:
-                detector.wells.remove(self)
+            detector.wells.discard(self)
         self.detectors = []
+        self.resetDetectorLabels()
         return self
     
     def clearAll(self):
@@ -240,58 +254,37 @@ class Well(object):
         return self.samples
     def getDetectors(self):
         return self.detectors
+    def resetSampleLabels(self):
+        self.sample_names = None
+        self.group_names = None
+    def resetGroupLabels(self):
+        self.group_names = None
+    def resetDetectorLabels(self):
+        self.detector_names = None
+        self.detector_values = None
+    def resetValueLabels(self):
+        self.detector_values = None
     def getSampleNames(self):
-        tmp = ''
-        for i in self.samples:
-            tmp += i.getName() + ';'
-        if tmp == '':
-            tmp = 'N/A'
-        return tmp
+        if self.sample_names == None:
+            self.sample_names = ''.join([i.getName() + ';' for i in self.samples]) or 'N/A'
+        return self.sample_names
     def getGroupNames(self):
-        tmp = ''
-        for i in self.samples:
-            tmp += i.getGroup().getName() + ';'
-        if tmp == '':
-            tmp += 'N/A'
-        return tmp
+        if self.group_names == None:
+            self.group_names = ''.join([i.getGroup().getName() + ';' for i in self.samples]) or 'N/A'
+        return self.group_names
     def getDetectorNames(self):
-        tmp = ''
-        for i in self.detectors:
-            tmp += i.getName() + ';'
-        if tmp == '':
-            tmp += 'N/A'
-        return tmp
+        if self.detector_names == None:
+            self.detector_names = ''.join([i.getName() + ';' for i in self.detectors]) or 'N/A'
+        return self.detector_names
     def getDetectorValues(self):
-        tmp = ''
-        for i in self.detectors:
-            tmp += i.getName() + ':' + str(i.getValue()) + ';'
-        if tmp == '':
-            tmp = 'N/A'
-        return tmp
+        if self.detector_values == None:
+            self.detector_values = ''.join([i.getName() + ':' + str(i.getValue()) + ';'
+                                            for i in self.detectors]) or 'N/A'
+        return self.detector_values
     
     def offset(self, n_rows, n_columns):
-        well = self
-        if n_rows < 0:
-            for i in range(abs(n_rows)):
-                well = well.getUp()
-                if well == None:
-                    return None
-        else:
-            for i in range(abs(n_rows)):
-                well = well.getDown()
-                if well == None:
-                    return None
-        if n_columns < 0:
-            for i in range(abs(n_columns)):
-                well = well.getLeft()
-                if well == None:
-                    return None
-        else:
-            for i in range(abs(n_columns)):
-                well = well.getRight()
-                if well == None:
-                    return None
-        return well
+        row, column = self.plate.codec.position(self.address)
+        return self.plate.getWellAt(row + n_rows, column + n_columns)
 
 class Plate(object):
     def __init__(self, name, n_rows, n_columns):
@@ -300,8 +293,9 @@ class Plate(object):
         self.n_columns = n_columns
         self.ui = Plate_ui(None, self, self.n_rows, self.n_columns, self.name)
         self.wells = {}
-        row_names = ROW_NAMES[:n_rows]
-        column_names = COLUMN_NAMES[:n_columns]
+        self.codec = addressing.codec(n_rows, n_columns)
+        row_names = self.codec.row_names
+        column_names = self.codec.column_names
         self.row_names = row_names
         self.column_names = column_names
         vbox = wx.BoxSizer(wx.VERTICAL)
@@ -320,8 +314,7 @@ class Plate(object):
         self.ui.Centre()
         self.ui.Show()
         for address in self.wells:
-            i = column_names.index(address[1:])
-            j = row_names.index(address[0])
+            j, i = self.codec.position(address)
             if i <> 0:
                 self.wells[address].setLeft(self.wells[row_names[j] + column_names[i-1]])
             else:
@@ -353,6 +346,11 @@ class Plate(object):
         return self.column_names    
     def getWell(self, address):
         return self.wells.get(address.upper(), None)    
+    def getWellAt(self, row, column):
+        address = self.codec.name(row, column)
+        if address == None:
+            return None
+        return self.wells[address]
     def wellInPlate(self, well):
         return well.getPlate() == self    
     def rangeInPlate(self, myRange):
@@ -361,54 +359,54 @@ class Plate(object):
 class Range(object):
     def __init__(self, start_well, end_well):
         self.plate = start_well.getPlate()
-        self.wells = {}
-        column_names = self.plate.getColumn_names()
-        row_names = self.plate.getRow_names()
-        i1 = column_names.index(start_well.getAddress()[1:])
-        i2 = column_names.index(end_well.getAddress()[1:])
-        j1 = row_names.index(start_well.getAddress()[0])
-        j2 = row_names.index(end_well.getAddress()[0])
-        i0 = min(i1, i2)
-        j0 = min(j1, j2)
-        self.start_well = self.plate.getWell(row_names[min(j1, j2)] + column_names[min(i1, i2)])
+        j1, i1 = self.plate.codec.position(start_well.getAddress())
+        j2, i2 = self.plate.codec.position(end_well.getAddress())
+        self.start_row = min(j1, j2)
+        self.start_column = min(i1, i2)
         self.n_rows = abs(j1 - j2) + 1
         self.n_columns = abs(i1 - i2) + 1
-        self.column_names = column_names[i0 : (i0 + self.n_columns)]
-        self.row_names = row_names[j0 : (j0 + self.n_rows)]
-        for i in range(self.n_columns):
-            for j in range(self.n_rows):
-                well = self.start_well.offset(j, i)
-                self.wells[well.getAddress()] = well
+        self.start_well = self.plate.getWellAt(self.start_row, self.start_column)
 
     def getPlate(self):
         return self.plate
     def getRow_names(self):
-        return self.row_names    
+        return self.plate.getRow_names()[self.start_row : self.start_row + self.n_rows]
     def getColumn_names(self):
-        return self.column_names    
+        return self.plate.getColumn_names()[self.start_column : self.start_column + self.n_columns]
     def getWell(self, address):
-        return self.wells.get(address.upper(), None)    
+        well = self.plate.getWell(address)
+        if well == None or not self.wellInRange(well):
+            return None
+        return well
     def getStartWell(self):
         return self.start_well
+    def iterWells(self):
+        for j in range(self.start_row, self.start_row + self.n_rows):
+            for i in range(self.start_column, self.start_column + self.n_columns):
+                yield self.plate.getWellAt(j, i)
+    
+    def posInRange(self, row, column):
+        return (self.start_row <= row < self.start_row + self.n_rows and
+                self.start_column <= column < self.start_column + self.n_columns)
     
     def wellInRange(self, well):
-        address = well.getAddress()
-        return well.getPlate() == self.getPlate() and address in self.wells
+        if well.getPlate() <> self.getPlate():
+            return False
+        return self.posInRange(*self.plate.codec.position(well.getAddress()))
     
     def rangeInRange(self, myRange):
         if myRange.getPlate() <> self.getPlate():
             return False
-        for well in myRange.wells:
-            if not self.wellInRange(well):
-                return False
-        return True
+        return (self.posInRange(myRange.start_row, myRange.start_column) and
+                self.posInRange(myRange.start_row + myRange.n_rows - 1,
+                                myRange.start_column + myRange.n_columns - 1))
     
     def show(self, item = 'address'):
         output = '' + chr(9) + chr(9).join(self.getColumn_names()) + chr(10)
         for j in range(self.n_rows):
             output += self.getRow_names()[j] + chr(9)
             for i in range(self.n_columns):
-                well = self.start_well.offset(j, i)
+                well = self.plate.getWellAt(self.start_row + j, self.start_column + i)
                 if item.lower() == 'address':
                     output += well.getAddress()
                 elif item.lower() == 'sample':
@@ -424,8 +422,9 @@ class Range(object):
         return output
     
     def offset(self, n_rows, n_columns):
-        start_well = self.getStartWell().offset(n_rows, n_columns)
-        end_well = self.getStartWell().offset(self.n_rows - 1, self.n_columns - 1).offset(n_rows, n_columns)
+        start_well = self.plate.getWellAt(self.start_row + n_rows, self.start_column + n_columns)
+        end_well = self.plate.getWellAt(self.start_row + self.n_rows - 1 + n_rows,
+                                        self.start_column + self.n_columns - 1 + n_columns)
         if start_well == None:
             return None
         elif end_well == None:
@@ -462,42 +461,46 @@ class Range(object):
 
     def copyTo(self, new_range, item = 'all'):
         tmp_plate = Plate('tmp', self.getPlate().n_rows, self.getPlate().n_columns)
-        address0 = self.getStartWell().getAddress()
-        address1 = new_range.getStartWell().getAddress()
-        j = ROW_NAMES.index(address1[0]) - ROW_NAMES.index(address0[0])
-        i = COLUMN_NAMES.index(address1[1:]) - COLUMN_NAMES.index(address0[1:])
-        for address in self.wells:
+        j0, i0 = self.getPlate().codec.position(self.getStartWell().getAddress())
+        j1, i1 = new_range.getPlate().codec.position(new_range.getStartWell().getAddress())
+        j = j1 - j0
+        i = i1 - i0
+        for well in self.iterWells():
+            address = well.getAddress()
             if item.lower() == 'all':
-                self.wells[address].copyAllTo(tmp_plate.getWell(address))
+                well.copyAllTo(tmp_plate.getWell(address))
             elif item.lower() == 'sample':
-                self.wells[address].copySamplesTo(tmp_plate.getWell(address))
+                well.copySamplesTo(tmp_plate.getWell(address))
             elif item.lower() == 'detector':
-                self.wells[address].copyDetectorsTo(tmp_plate.getWell(address))
-        for address in self.wells:
+                well.copyDetectorsTo(tmp_plate.getWell(address))
+        for well in self.iterWells():
+            address = well.getAddress()
             new_well = new_range.getPlate().getWell(address).offset(j, i)
             if new_well <> None:
                 tmp_plate.getWell(address).copyAllTo(new_well)
                 
     def moveTo(self, new_range, item = 'all'):
         tmp_plate = Plate('tmp', self.getPlate().n_rows, self.getPlate().n_columns)
-        address0 = self.getStartWell().getAddress()
-        address1 = new_range.getStartWell().getAddress()
-        j = ROW_NAMES.index(address1[0]) - ROW_NAMES.index(address0[0])
-        i = COLUMN_NAMES.index(address1[1:]) - COLUMN_NAMES.index(address0[1:])
-        for address in self.wells:
+        j0, i0 = self.getPlate().codec.position(self.getStartWell().getAddress())
+        j1, i1 = new_range.getPlate().codec.position(new_range.getStartWell().getAddress())
+        j = j1 - j0
+        i = i1 - i0
+        for well in self.iterWells():
+            address = well.getAddress()
             if item.lower() == 'all':
-                self.wells[address].moveAllTo(tmp_plate.getWell(address))
+                well.moveAllTo(tmp_plate.getWell(address))
             elif item.lower() == 'sample':
-                self.wells[address].moveSamplesTo(tmp_plate.getWell(address))
+                well.moveSamplesTo(tmp_plate.getWell(address))
             elif item.lower() == 'detector':
-                self.wells[address].moveDetectorsTo(tmp_plate.getWell(address))
-        for address in self.wells:
+                well.moveDetectorsTo(tmp_plate.getWell(address))
+        for well in self.iterWells():
+            address = well.getAddress()
             new_well = new_range.getPlate().getWell(address).offset(j, i)
             if new_well <> None:
                 tmp_plate.getWell(address).copyAllTo(new_well)
                 
     def clear(self, item = 'all'):
-        for well in self.wells.values():
+        for well in self.iterWells():
             if item.lower() == 'all':
                 well.clearAll()
             elif item.lower() == 'sample':
@@ -559,16 +562,16 @@ class Well_ui(wx.Panel):
             self.Parent.range.append(self.address)
             new_rng = Range(self.plate.getWell(self.Parent.range[0]), self.plate.getWell(self.Parent.range[-1]))
             if self.plate.selected_rng <> None:
-                for well in self.plate.selected_rng.wells.values():
+                for well in self.plate.selected_rng.iterWells():
                     if not new_rng.wellInRange(well):
                         well.ui.active = False
                         well.ui.Refresh()
-                for well in new_rng.wells.values():
+                for well in new_rng.iterWells():
                     if not self.plate.selected_rng.wellInRange(well):
                         well.ui.active = True
                         well.ui.Refresh()
             else:
-                for well in new_rng.wells.values():
+                for well in new_rng.iterWells():
                     well.ui.active = True
                     well.ui.Refresh()
             self.plate.selected_rng = new_rng
@@ -586,14 +589,14 @@ class Well_ui(wx.Panel):
         if self.mouseover:
             self.Parent.range.append(self.address)
             self.plate.selected_rng = Range(self.plate.getWell(self.Parent.range[0]), self.plate.getWell(self.Parent.range[-1]))
-            for well in self.plate.selected_rng.wells.values():
+            for well in self.plate.selected_rng.iterWells():
                 well.ui.active = True
                 well.ui.Refresh()
             print self.Parent.range
     
     def OnLeftup(self, e):
         self.Parent.range = []
-        for well in self.plate.selected_rng.wells.values():
+        for well in self.plate.selected_rng.iterWells():
             well.ui.active = False
             well.ui.Refresh()
         print self.plate.selected_rng.show()
@@ -614,7 +617,7 @@ class Plate_ui(wx.Frame):
         
     def OnLeftup(self, e):
         self.range = []
-        for well in self.plate.selected_rng.wells.values():
+        for well in self.plate.selected_rng.iterWells():
             well.ui.active = False
             well.ui.Refresh()
         print self.plate.selected_rng.show()
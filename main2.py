@@ -1,462 +1,183 @@
 #!/usr/bin/env python
 
-import string
+import os
 import wx
-ROW_NAMES = list(string.ascii_uppercase)
-COLUMN_NAMES = map(str, range(1, 100))
-
-class Sample(object):
-    def __init__(self, name):
-        self.name = name
-        self.group = None
-        self.wells = set()
-        
-    def getName(self):
-        return self.name
-    
-    def isControl(self):
-        return self.getGroup().isControl()
-    
-    def setGroup(self, group):
-        self.group = group
-        return self
-        
-    def getGroup(self):
-        return self.group
-    
-class SampleList(object):
-    def __init__(self, name, start, n):
-        self.samples = []
-        for i in range(start, start + n):
-            sample = Sample(name + '_' + str(i))
-            self.samples.append(sample)
-            
-    def getSamples(self):
-        return self.samples
-    
-    def subset(self, start, n = 1):
-        tmp = []
-        for i in range(start, start + n):
-            try:
-                tmp.append(self.samples[i - 1])
-            except IndexError:
-                break
-        return tmp
-
-class Group(object):
-    def __init__(self, name):
-        self.name = name
-        self.samples = []
-        self.treatment = {}
-        self.control = False
-        
-    def addSample(self, sample):
-        if not sample in self.samples:
-            self.samples.append(sample)
-            sample.group = self
-        return self
-            
-    def addSampleList(self, list_of_samples):
-        for sample in list_of_samples:
-            self.addSample(sample)
-        return self
-        
-    def getName(self):
-        return self.name
-    
-    def getSample(self, sample_name):
-        for sample in self.samples:
-            if sample.getName() == sample_name:
-                return sample
-        else:
-            return None
-    
-    def getSamples(self):
-        return self.samples
-    
-    def setTreatment(self, treatment, value):
-        self.treatment[treatment] = value
-        return self
-    
-    def isControl(self):
-        return self.control
-
-class Detector(object):
-    def __init__(self, name):
-        self.name = name
-        self.value = None
-        self.control = False
-        self.wells = set()
-        
-    def getName(self):
-        return self.name
-    
-    def setValue(self, value):
-        self.value = value
-        return self
-        
-    def getValue(self):
-        return self.value
-
-    def isControl(self):
-        return self.control
-    
-class Well(object):
-    def __init__(self, address, plate):
-        self.address = address
-        self.omit = False
-        self.plate = plate
-        self.samples = set()
-        self.detectors = set()
-        self.ui = Well_ui(self.plate.ui.mainpanel, self.plate, self)
-
-#
-    def addSample(self, sample):
-        self.samples.add(sample)
-        sample.wells.add(self)
-        return self
-    def addDetector(self, detector):
-        self.detectors.add(detector)
-        detector.wells.add(self)
-        return self
-    def removeSample(self, sample):
-        self.samples.discard(sample)
-        sample.wells.discard(self)
-        return self
-    def removeDetector(self, detector):
-        self.detectors.discard(detector)
-        detector.wells.discard(self)
-        return self
-    def clearSamples(self):
-        for sample in self.samples:
-            sample.wells.discard(self)
-        self.samples.clear()
-        return self
-    def clearDetectors(self):
-        for detector in self.detectors:
-            detector.wells.discard(self)
-        self.detectors.clear()
-        return self
-    def clearAll(self):
-        self.clearSamples()
-        self.clearDetectors()
-        return self
-    def copySamplesTo(self, new_well):
-        new_well.clearSamples()
-        for sample in self.samples:
-            new_well.addSample(sample)
-        return self
-    def copyDetectorsTo(self, new_well):
-        new_well.clearDetectors()
-        for detector in self.detectors:
-            new_well.addDetector(detector)
-        return self
-    def copyAllTo(self, new_well):
-        self.copySamplesTo(new_well)
-        self.copyDetectorsTo(new_well)
-        return self
-    def moveSamplesTo(self, new_well):
-        new_well.clearSamples()
-        for sample in self.samples:
-            new_well.addSample(sample)
-        self.clearSamples()
-        return self
-    def moveDetectorsTo(self, new_well):
-        new_well.clearDetectors()
-        for detector in self.detectors:
-            new_well.addDetector(detector)
-        self.clearDetectors()
-        return self
-    def moveAllTo(self, new_well):
-        self.moveSamplesTo(new_well)
-        self.moveDetectorsTo(new_well)
-        return self
-    def getSampleNames(self):
-        tmp = ''
-        for i in self.samples:
-            tmp += i.getName() + ';'
-        if tmp == '':
-            tmp = 'NA'
-        return tmp
-    def getGroupNames(self):
-        tmp = ''
-        for i in self.samples:
-            tmp += i.getGroup().getName() + ';'
-        if tmp == '':
-            tmp += 'NA'
-        return tmp
-    def getDetectorNames(self):
-        tmp = ''
-        for i in self.detectors:
-            tmp += i.getName() + ';'
-        if tmp == '':
-            tmp += 'NA'
-        return tmp
-    def getDetectorValues(self):
-        tmp = ''
-        for i in self.detectors:
-            tmp += i.getName() + ':' + str(i.getValue()) + ';'
-        if tmp == '':
-            tmp = 'NA'
-        return tmp
-    def offset(self, n_rows, n_columns):
-        r = ROW_NAMES.index(self.address[0])
-        c = COLUMN_NAMES.index(self.address[1:])
-        try:
-            new_address = ROW_NAMES[r + n_rows] + COLUMN_NAMES[c + n_columns]
-        except IndexError:
-            return None
-        return self.plate.getWell(new_address)
-
-class Plate(object):
-    def __init__(self, name = 'Plate', n_rows = 8, n_columns = 12):
-        self.name = name
-        self.n_rows = n_rows
-        self.n_columns = n_columns
-        self.ui = Plate_ui(None, self)
-        self.initui()
-        
-    def addWells(self):
-        self.wells = {}
-        self.grid = wx.GridSizer(self.n_rows, self.n_columns, 1, 1)
-        n = 0
-        for j in range(self.n_rows):
-            for i in range(self.n_columns):
-                address = ROW_NAMES[j] + COLUMN_NAMES[i]
-                well = Well(address, self)
-                self.wells[address] = well
-                self.grid.Add(well.ui, 0, wx.EXPAND|wx.ALL, 0)
-                n += 1
-                self.ui.gauge.SetValue(n)
-        self.ui.mainsizer.Add(self.grid, 1, wx.EXPAND, 0)
-        self.ui.gaugepanel.Hide()
-        self.ui.toppanel.Show()
-        self.ui.mainpanel.Show()
-        self.ui.Layout()
-
-    def getName(self):
-        return self.name
-    def getNrows(self):
-        return self.n_rows
-    def getNcols(self):
-        return self.n_columns
-    def getRow_names(self):
-        return ROW_NAMES[:self.n_rows]    
-    def getColumn_names(self):
-        return COLUMN_NAMES[:self.n_columns]    
-    def getWell(self, address):
-        return self.wells.get(address.upper(), None)    
-    def wellInPlate(self, well):
-        return well.plate == self    
-    def rangeInPlate(self, myRange):
-        return myRange.plate == self
-    def initui(self):
-
-        #self.ui.mainpanel.SetSizer(self.grid)
-        #self.ui.vbox = wx.BoxSizer(wx.VERTICAL)
-        #self.ui.vbox.Add(self.ui.toppanel, 0, flag=wx.EXPAND|wx.LEFT|wx.TOP|wx.RIGHT, border = 0)
-        #self.ui.vbox.Add(self.ui.mainpanel, proportion = 1, flag=wx.EXPAND|wx.ALL, border = 5)
-        #self.ui.mainpanel.Hide()
-        #self.ui.vbox.Add(self.grid, proportion = 1, flag=wx.EXPAND|wx.ALL, border = 10)
-
-        #self.ui.SetSizer(vbox)
-        #self.ui.mainsizer.Add(self.grid, 1, wx.EXPAND, 0)
-        self.ui.SetSizer(self.ui.vbox)
-        self.ui.SetSize((self.n_columns * 75, self.n_rows * 60))
-        self.ui.SetTitle(self.name)
-        self.ui.Centre()
-        self.ui.Show()
-        self.over_well = None
-        self.start_well = None
-        self.selected_rng = None
-
-class Range(object):
-    def __init__(self, start_well, end_well):
-        self.plate = start_well.plate
-        self.wells = set()
-        column_names = self.plate.getColumn_names()
-        row_names = self.plate.getRow_names()
-        i1 = column_names.index(start_well.address[1:])
-        i2 = column_names.index(end_well.address[1:])
-        j1 = row_names.index(start_well.address[0])
-        j2 = row_names.index(end_well.address[0])
-        i0 = min(i1, i2)
-        j0 = min(j1, j2)
-        self.start_well = self.plate.getWell(row_names[j0] + column_names[i0])
-        self.n_rows = abs(j1 - j2) + 1
-        self.n_columns = abs(i1 - i2) + 1
-        self.column_names = column_names[i0 : (i0 + self.n_columns)]
-        self.row_names = row_names[j0 : (j0 + self.n_rows)]
-        for i in range(self.n_columns):
-            for j in range(self.n_rows):
-                well = self.start_well.offset(j, i)
-                self.wells.add(well)
-
-    def getPlate(self):
-        return self.plate
-    def getRow_names(self):
-        return self.row_names    
-    def getColumn_names(self):
-        return self.column_names    
-    def getWell(self, address):
-        return self.plate.wells.get(address.upper(), None)    
-    def getStartWell(self):
-        return self.start_well
-    
-    def wellInRange(self, well):
-        return well in self.wells
-    
-    def rangeInRange(self, myRange):
-        if myRange.plate <> self.plate:
-            return False
-        for well in myRange.wells:
-            if not self.wellInRange(well):
-                return False
-        return True
-    
-    def show(self, item = 'address'):
-        output = '' + chr(9) + chr(9).join(self.getColumn_names()) + chr(10)
-        for j in range(self.n_rows):
-            output += self.getRow_names()[j] + chr(9)
-            for i in range(self.n_columns):
-                well = self.start_well.offset(j, i)
-                if item.lower() == 'address':
-                    output += well.address
-                elif item.lower() == 'sample':
-                    output += well.getSampleNames() 
-                elif item.lower() == 'group':
-                    output += well.getGroupNames() 
-                elif item.lower() == 'detector':
-                    output +=  well.getDetectorNames() 
-                elif item.lower() == 'value':
-                    output +=  well.getDetectorValues() 
-                output += chr(9)
-            output += chr(10)
-        return output
-    
-    def offset(self, n_rows, n_columns):
-        start_well = self.getStartWell().offset(n_rows, n_columns)
-        end_well = self.getStartWell().offset(self.n_rows - 1, self.n_columns - 1).offset(n_rows, n_columns)
-        if start_well == None:
-            return None
-        elif end_well == None:
-            return None
-        else:
-            return Range(start_well, end_well)
-        
-    def autoFill(self, item = 'sample', entry = [], index = 0, n_row = 2, n_column = 2, direction = 1, fill_by = 'replace', iteration = True, s_shape = False):
-        x = self.n_columns / n_column
-        y = self.n_rows / n_row
-        if direction == 1:
-            for i in range(x):
-                for j in range(y):
-                    well = self.getStartWell().offset(j*n_row, i*n_column)
-                    for m in range(n_column):
-                        for n in range(n_row):
-                            if item.lower() == 'sample':
-                                if fill_by == 'replace':
-                                    well.offset(n, m).clearSamples()
-                                well.offset(n, m).addSample(entry[index % len(entry)])
-                            elif item.lower() == 'detector':
-                                if fill_by == 'replace':
-                                    well.offset(n, m).clearDetectors()
-                                well.offset(n, m).addDetector(entry[index % len(entry)])
-                    if iteration:
-                        index += 1
-        elif direction == 2:
-            for j in range(y):
-                for i in range(x):
-                    well = self.getStartWell().offset(j*n_row, i*n_column)
-                    for m in range(n_column):
-                        for n in range(n_row):
-                            if item.lower() == 'sample':
-                                if fill_by == 'replace':
-                                    well.offset(n, m).clearSamples()
-                                well.offset(n, m).addSample(entry[index % len(entry)])
-                            elif item.lower() == 'detector':
-                                if fill_by == 'replace':
-                                    well.offset(n, m).clearDetectors()
-                                well.offset(n, m).addDetector(entry[index % len(entry)])
-                    if iteration:
-                        index += 1
-        return index % len(entry)
-
-    def copyTo(self, new_range, item = 'all'):
-        tmp_plate = Plate('tmp', self.plate.n_rows, self.plate.n_columns)
-        address0 = self.getStartWell().address
-        address1 = new_range.getStartWell().address
-        j = ROW_NAMES.index(address1[0]) - ROW_NAMES.index(address0[0])
-        i = COLUMN_NAMES.index(address1[1:]) - COLUMN_NAMES.index(address0[1:])
-        for well in self.wells:
-            if item.lower() == 'all':
-                well.copyAllTo(tmp_plate.getWell(well.address))
-            elif item.lower() == 'sample':
-                well.copySamplesTo(tmp_plate.getWell(well.address))
-            elif item.lower() == 'detector':
-                well.copyDetectorsTo(tmp_plate.getWell(well.address))
-        for well in self.wells:
-            new_well = new_range.plate.getWell(well.address).offset(j, i)
-            if new_well <> None:
-                tmp_plate.getWell(well.address).copyAllTo(new_well)
-                
-    def moveTo(self, new_range, item = 'all'):
-        tmp_plate = Plate('tmp', self.plate.n_rows, self.plate.n_columns)
-        address0 = self.getStartWell().address
-        address1 = new_range.getStartWell().address
-        j = ROW_NAMES.index(address1[0]) - ROW_NAMES.index(address0[0])
-        i = COLUMN_NAMES.index(address1[1:]) - COLUMN_NAMES.index(address0[1:])
-        for well in self.wells:
-            if item.lower() == 'all':
-                well.moveAllTo(tmp_plate.getWell(well.address))
-            elif item.lower() == 'sample':
-                well.moveSamplesTo(tmp_plate.getWell(well.address))
-            elif item.lower() == 'detector':
-                well.moveDetectorsTo(tmp_plate.getWell(well.address))
-        for well in self.wells:
-            new_well = new_range.plate.getWell(well.address).offset(j, i)
-            if new_well <> None:
-                tmp_plate.getWell(well.address).copyAllTo(new_well)
-                
-    def clear(self, item = 'all'):
-        for well in self.wells:
-            if item.lower() == 'all':
-                well.clearAll()
-            elif item.lower() == 'sample':
-                well.clearSamples()
-            elif item.lower() == 'detector':
-                well.clearDetectors()
+import blocks
+import instrument
+import journal
+import rawdata
+from model import SampleList, Group, Detector, Plate, Range
 
 #UI
-class Well_ui(wx.Panel):
-    def __init__(self, parent, plate, well, over_color = '#F5F5F5', active_color = '#FFF8DC', inactive_color = 'white'):
-        super(Well_ui, self).__init__(parent)
+class Repaint_scheduler(object):
+    def __init__(self, window, statusbar):
+        self.window = window
+        self.statusbar = statusbar
+        self.rects = {}
+        self.full = False
+        self.status = None
+        self.shown = {}
+        self.window.Bind(wx.EVT_IDLE, self.OnIdle)
+
+    def invalidate(self, rect = None):
+        if rect == None:
+            self.full = True
+        elif not self.full:
+            self.rects[tuple(rect)] = rect
+
+    def setStatus(self, texts):
+        # texts is a callable so labels are only built for the last well shown
+        self.status = texts
+
+    @instrument.timed('ui.flush')
+    def flush(self):
+        if not (self.full or self.rects or self.status):
+            return
+        self.window.Freeze()
+        try:
+            if self.full:
+                self.window.Refresh(False)
+            else:
+                for rect in self.rects.values():
+                    self.window.RefreshRect(rect, False)
+            if self.status <> None:
+                for field, text in enumerate(self.status()):
+                    if self.shown.get(field) <> text:
+                        self.statusbar.SetStatusText(text, field)
+                        self.shown[field] = text
+        finally:
+            self.window.Thaw()
+        self.rects = {}
+        self.full = False
+        self.status = None
+
+    def OnIdle(self, e):
+        self.flush()
+        e.Skip()
+
+class Plate_canvas(wx.Panel):
+    def __init__(self, parent, plate, over_color = '#F5F5F5', active_color = '#FFF8DC', inactive_color = 'white', gap = 1):
+        super(Plate_canvas, self).__init__(parent, style = wx.WANTS_CHARS)
         self.plate = plate
-        self.well = well
-        self.active = False
         self.over_color = over_color
         self.active_color = active_color
         self.inactive_color = inactive_color
-        self.color = self.inactive_color
-        self.SetBackgroundColour(self.color)
-        self.mouseover = False
+        self.gap = gap
+        # another key pressed while Ctrl was held, e.g. Ctrl+Z: releasing
+        # Ctrl then must not commit the Ctrl selection
+        self.chord = False
+        self.SetBackgroundStyle(wx.BG_STYLE_CUSTOM)
+        self.font9 = wx.Font(9, wx.MODERN, wx.SLANT, wx.NORMAL, False, u'Consolas')
+        self.font8 = wx.Font(8, wx.MODERN, wx.NORMAL, wx.NORMAL, False, u'Consolas')
+        self.Bind(wx.EVT_PAINT, self.OnPaint)
+        self.Bind(wx.EVT_SIZE, self.OnSize)
         self.Bind(wx.EVT_LEFT_DOWN, self.OnLeftdown)
         self.Bind(wx.EVT_LEFT_UP, self.plate.ui.OnLeftup)
         self.Bind(wx.EVT_MOTION, self.OnMotion)
         self.Bind(wx.EVT_KEY_DOWN, self.OnKeydown)
         self.Bind(wx.EVT_KEY_UP, self.OnKeyup)
-        font9 = wx.Font(9, wx.MODERN, wx.SLANT, wx.NORMAL, False, u'Consolas')
-        font8 = wx.Font(8, wx.MODERN, wx.NORMAL, wx.NORMAL, False, u'Consolas')
-        self.t1 = wx.StaticText(self, label=self.well.address, pos = (1, 0))
-        self.t1.SetFont(font9)
-        self.t2 = wx.StaticText(self, label=self.well.getSampleNames(), pos = (1, 13))
-        self.t2.SetFont(font8)
-        self.t1.Bind(wx.EVT_LEFT_DOWN, self.OnLeftdown)
-        self.t2.Bind(wx.EVT_LEFT_DOWN, self.OnLeftdown)
-        self.t1.Bind(wx.EVT_LEFT_UP, self.OnLeftup)
-        self.t2.Bind(wx.EVT_LEFT_UP, self.OnLeftup)
-        self.t1.Bind(wx.EVT_MOTION, self.OnMotion)
-        self.t2.Bind(wx.EVT_MOTION, self.OnMotion)
-    
+        self.scheduler = Repaint_scheduler(self, self.plate.ui.sb)
+
+    def cellSize(self):
+        w, h = self.GetClientSize()
+        return (float(w + self.gap) / self.plate.n_columns,
+                float(h + self.gap) / self.plate.n_rows)
+
+    def cellRect(self, row, column):
+        cw, ch = self.cellSize()
+        x = int(column * cw)
+        y = int(row * ch)
+        return wx.Rect(x, y, int((column + 1) * cw) - x - self.gap, int((row + 1) * ch) - y - self.gap)
+
+    def hitTest(self, x, y):
+        if x < 0 or y < 0:
+            return None
+        cw, ch = self.cellSize()
+        return self.plate.getWellAt(int(y / ch), int(x / cw))
+
+    def refreshWell(self, well):
+        row, column = self.plate.codec.position(well.address)
+        self.scheduler.invalidate(self.cellRect(row, column))
+
+    def refreshCells(self, cells):
+        rect = self.cellRect(cells[0], cells[1])
+        rect.Union(self.cellRect(cells[0] + cells[2] - 1, cells[1] + cells[3] - 1))
+        self.scheduler.invalidate(rect)
+
+    def getLabel(self, well):
+        if self.plate.ui.item == 'sample':
+            return well.getSampleNames()
+        elif self.plate.ui.item == 'detector':
+            return well.getDetectorNames()
+        elif self.plate.ui.item == 'value':
+            return well.getDetectorValues()
+        return ''
+
+    def getColor(self, well, row, column):
+        if self.plate.ui.selection.contains(row, column):
+            return self.active_color
+        elif well is self.plate.ui.over_well:
+            return self.over_color
+        return self.inactive_color
+
+    def showStatus(self, well):
+        self.scheduler.setStatus(lambda: ('Address: ' + well.address,
+                                          'Samples: ' + well.getSampleNames(),
+                                          'Detectors: ' + well.getDetectorNames()))
+
+    @instrument.timed('ui.paint')
+    def OnPaint(self, e):
+        dc = wx.AutoBufferedPaintDC(self)
+        box = self.GetUpdateRegion().GetBox()
+        dc.SetBrush(wx.Brush(self.GetParent().GetBackgroundColour()))
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.DrawRectangleRect(box)
+        cw, ch = self.cellSize()
+        row0 = max(0, int(box.y / ch))
+        row1 = min(self.plate.n_rows, int((box.y + box.height) / ch) + 1)
+        column0 = max(0, int(box.x / cw))
+        column1 = min(self.plate.n_columns, int((box.x + box.width) / cw) + 1)
+        for row in range(row0, row1):
+            for column in range(column0, column1):
+                self.drawWell(dc, row, column, self.cellRect(row, column))
+        instrument.count('ui.wells drawn', (row1 - row0) * (column1 - column0))
+
+    def drawWell(self, dc, row, column, rect):
+        well = self.plate.getWellAt(row, column)
+        dc.SetBrush(wx.Brush(self.getColor(well, row, column)))
+        dc.DrawRectangleRect(rect)
+        dc.SetClippingRect(rect)
+        dc.SetFont(self.font9)
+        dc.DrawText(well.address, rect.x + 1, rect.y)
+        dc.SetFont(self.font8)
+        dc.DrawText(self.getLabel(well), rect.x + 1, rect.y + 13)
+        dc.DestroyClippingRegion()
+
+    def OnSize(self, e):
+        self.scheduler.invalidate()
+        e.Skip()
+
+    def setOverWell(self, well):
+        old_well = self.plate.ui.over_well
+        self.plate.ui.over_well = well
+        if old_well <> None and old_well is not well:
+            self.refreshWell(old_well)
+        self.refreshWell(well)
+        self.showStatus(well)
+
+    def startSelection(self, well):
+        for strip in self.plate.ui.selection.start(self.plate.codec.position(well.address)):
+            self.refreshCells(strip)
+
+    def extendSelection(self, well):
+        for strip in self.plate.ui.selection.extend(self.plate.codec.position(well.address)):
+            self.refreshCells(strip)
+
+    def clearSelection(self):
+        for strip in self.plate.ui.selection.clear():
+            self.refreshCells(strip)
+
+    @instrument.timed('ui.OnKeydown', gesture = True)
     def OnKeydown(self, e):
         keymap = {65 : (0, -1),
                   83 : (1, 0),
@@ -465,117 +186,54 @@ class Well_ui(wx.Panel):
 
         key = e.GetKeyCode()
         a = keymap.get(key)
-        if a <> None and self.plate.over_well <> None:
-            old_well = self.plate.over_well
-            new_well = old_well.offset(a[0], a[1])
+        if a <> None and self.plate.ui.over_well <> None:
+            new_well = self.plate.ui.over_well.offset(a[0], a[1])
             if new_well <> None:
-                old_well.ui.mouseover = False
-                old_well.ui.update()
-                new_well.ui.mouseover = True
-                new_well.ui.update()
-                self.plate.over_well = new_well
-                if e.ControlDown():
-                    new_rng = Range(self.plate.start_well, self.plate.over_well)
-
-                    if self.plate.over_well in self.plate.selected_rng.wells:
-                        for well in self.plate.selected_rng.wells - new_rng.wells:
-                            well.ui.active = False
-                            well.ui.update()
-                    else:
-                        for well in new_rng.wells - self.plate.selected_rng.wells:
-                            well.ui.active = True
-                            well.ui.update()
-                    self.plate.selected_rng = new_rng
+                self.setOverWell(new_well)
+                if e.ControlDown() and self.plate.ui.selection.isActive():
+                    self.extendSelection(new_well)
         elif a == None:
+            if key <> 308 and e.ControlDown():
+                self.chord = True
             if key == 308:
-                if self.plate.selected_rng == None:
-                    self.plate.selected_rng = Range(self.plate.over_well, self.plate.over_well)
-                    self.plate.start_well = self.plate.over_well
-                    self.plate.over_well.ui.active = True
-                    self.plate.over_well.ui.update()
+                if not self.plate.ui.selection.isActive() and self.plate.ui.over_well <> None:
+                    self.chord = False
+                    self.startSelection(self.plate.ui.over_well)
+            elif key in (89, 90) and e.ControlDown():
+                self.plate.ui.OnUndo(redo = key == 89)
+            elif key == wx.WXK_F11:
+                instrument.enable()
+                instrument.captureNext('gesture.prof')
+            elif key == wx.WXK_F12:
+                instrument.dump(histograms = True)
 
     def OnKeyup(self, e):
         if e.GetKeyCode() == 308:
-            self.OnLeftup(e)
-                  
-    
+            if self.chord:
+                self.chord = False
+                self.clearSelection()
+            else:
+                self.plate.ui.OnLeftup(e)
+
+    @instrument.timed('ui.OnMotion')
     def OnMotion(self, e):
-        #print 'move'
-        #if self.well <> self.plate.over_well:
-        if self.plate.over_well <> None:
-            self.plate.over_well.ui.mouseover = False
-            self.plate.over_well.ui.update()
-        self.plate.over_well = self.well
+        well = self.hitTest(*e.GetPosition())
+        if well == None or well is self.plate.ui.over_well:
+            return
         self.SetFocus()
-        self.mouseover = True
-        self.update()
+        self.setOverWell(well)
         if e.LeftIsDown():
-            if self.plate.selected_rng == None:
-                #self.plate.over_well = self.well
-                #self.mouseover = True
-                self.plate.selected_rng = Range(self.plate.over_well, self.plate.over_well)
-                self.plate.start_well = self.well
-                self.active = True
-                self.update()
-            else:
-                new_rng = Range(self.plate.start_well, self.well)
-                if self.well in self.plate.selected_rng.wells:
-                    for well in self.plate.selected_rng.wells - new_rng.wells:
-                        well.ui.active = False
-                        well.ui.update()
-                else:
-                    for well in new_rng.wells - self.plate.selected_rng.wells:
-                        well.ui.active = True
-                        well.ui.update()
-                self.plate.selected_rng = new_rng
-   
-    def update(self):
-        if self.active:
-            self.color = self.active_color
-        elif self.mouseover:
-            self.color = self.over_color
-        else:
-            self.color = self.inactive_color
-        self.SetBackgroundColour(self.color)
-        if self.plate.ui.item == 'sample':
-            self.t2.SetLabel(self.well.getSampleNames())
-        elif self.plate.ui.item == 'detector':
-            self.t2.SetLabel(self.well.getDetectorNames())
-        elif self.plate.ui.item == 'value':
-            self.t2.SetLabel(self.well.getDetectorValues())
-        self.plate.ui.sb.SetStatusText('Address: ' + self.well.address, 0)
-        self.plate.ui.sb.SetStatusText('Samples: ' + self.well.getSampleNames(), 1)
-        self.plate.ui.sb.SetStatusText('Detectors: ' + self.well.getDetectorNames(), 2)
-        #self.plate.ui.Info_Address.SetLabel(self.well.address)
-        #self.plate.ui.Info_Samples.SetLabel(self.well.getSampleNames())
-        #self.plate.ui.Info_Detectors.SetLabel(self.well.getDetectorNames())
-        self.Refresh()
+            self.extendSelection(well)
 
+    @instrument.timed('ui.OnLeftdown', gesture = True)
     def OnLeftdown(self, e):
-        self.plate.selected_rng = Range(self.plate.over_well, self.plate.over_well)
-        self.plate.start_well = self.well
-        self.active = True
-        self.plate.over_well = self.well
+        well = self.hitTest(*e.GetPosition())
+        if well == None:
+            return
         self.SetFocus()
-        self.mouseover = True
-        self.update()
-    
-    def OnLeftup(self, e):
-        n = self.plate.selected_rng.autoFill(item = self.plate.ui.item,
-                                            entry = self.plate.ui.entry,
-                                            index = self.plate.ui.index[self.plate.ui.item],
-                                            n_row = self.plate.ui.Settings_row.GetValue(),
-                                            n_column = self.plate.ui.Settings_col.GetValue(),
-                                            fill_by = self.plate.ui.Operation_Fill_by.GetValue(),
-                                            direction = self.plate.ui.direction)
-        self.plate.ui.index[self.plate.ui.item] = n
-
-        self.plate.ui.Settings_entry.SetSelection(n)
-        for well in self.plate.selected_rng.wells:
-            well.ui.active = False
-            well.ui.update()
-        self.plate.selected_rng = None
-    
+        self.setOverWell(well)
+        self.startSelection(well)
+
 class Plate_ui(wx.Frame):
     def __init__(self, parent, plate):
         super(Plate_ui, self).__init__(parent)
@@ -587,8 +245,17 @@ class Plate_ui(wx.Frame):
         self.clear = 'all'
         self.s_shape = False
         self.entry = sample
+        self.over_well = None
+        self.selection = blocks.Selection()
+        self.plate.ui = self
+        journal.Journal().attach(self.plate)
         self.initui()
         self.bind_event()
+        self.SetSizer(self.vbox)
+        self.SetSize((self.plate.n_columns * 75, self.plate.n_rows * 60))
+        self.SetTitle(self.plate.name)
+        self.Centre()
+        self.Show()
 
     def initui(self):
         toppanel = wx.Panel(self)
@@ -661,14 +328,11 @@ class Plate_ui(wx.Frame):
         self.mainsizer = wx.BoxSizer(wx.VERTICAL)
         self.mainpanel.SetSizer(self.mainsizer)
         self.mainpanel.Hide()
-        
-        self.gaugepanel = wx.Panel(self)
-        self.gauge = wx.Gauge(self.gaugepanel, range=self.plate.n_columns * self.plate.n_rows, size=(250, 25))
+        self.canvas = None
 
         self.vbox = wx.BoxSizer(wx.VERTICAL)
         self.vbox.Add(self.toppanel, 0, flag=wx.EXPAND|wx.LEFT|wx.TOP|wx.RIGHT, border = 0)
         self.vbox.Add(self.mainpanel, proportion = 1, flag=wx.EXPAND|wx.ALL, border = 3)
-        self.vbox.Add(self.gaugepanel, proportion = 1, flag=wx.EXPAND|wx.ALL, border = 3)
         
     def bind_event(self):
         self.Bind(wx.EVT_LEFT_DOWN, self.OnLeftdown)
@@ -683,8 +347,32 @@ class Plate_ui(wx.Frame):
         self.Settings_Direction1.Bind(wx.EVT_RADIOBUTTON, self.OnDirectionchange)
         self.Settings_Direction2.Bind(wx.EVT_RADIOBUTTON, self.OnDirectionchange)
 
+    def addWells(self):
+        if self.canvas <> None:
+            return
+        self.canvas = Plate_canvas(self.mainpanel, self.plate)
+        self.mainsizer.Add(self.canvas, 1, wx.EXPAND, 0)
+        self.toppanel.Show()
+        self.mainpanel.Show()
+        self.Layout()
+
+    @instrument.timed('ui.OnRawdataload')
     def OnRawdataload(self, e):
-        self.plate.addWells()
+        self.addWells()
+        dialog = wx.FileDialog(self, 'Load Raw Data', wildcard = 'Results (*.txt;*.csv)|*.txt;*.csv|All files|*.*',
+                               style = wx.FD_OPEN|wx.FD_FILE_MUST_EXIST)
+        if dialog.ShowModal() == wx.ID_OK:
+            detectors = dict((i.getName(), i) for i in detector)
+            try:
+                stats = rawdata.loadWells(self.plate, dialog.GetPath(), detectors)
+            except (IOError, rawdata.RawDataError), error:
+                wx.MessageBox(str(error), 'Load Raw Data', wx.OK|wx.ICON_ERROR)
+            else:
+                detector.extend([i for i in detectors.values() if i not in detector])
+                self.refreshCanvas()
+                text = '%(loaded)d of %(rows)d rows loaded' % stats
+                self.canvas.scheduler.setStatus(lambda: (text,))
+        dialog.Destroy()
     
     def OnOperationchange(self, e):
         f = self.Operation_fill.GetValue()
@@ -694,6 +382,7 @@ class Plate_ui(wx.Frame):
         elif c:
             self.operation = 'clear'
     
+    @instrument.timed('ui.OnItemchange', gesture = True)
     def OnItemchange(self, e):
         s = self.Items_Samples.GetValue()
         d = self.Items_Detectors.GetValue()
@@ -701,9 +390,7 @@ class Plate_ui(wx.Frame):
         if s:
             self.item = 'sample'
             self.entry = sample
-            for well in self.plate.wells.values():
-                well.ui.t2.SetLabel(well.getSampleNames())
-                well.ui.Refresh()
+            self.refreshCanvas()
             self.Settings_entry.Clear()
             choice_list = []
             for i in self.entry:
@@ -713,9 +400,7 @@ class Plate_ui(wx.Frame):
         elif d:
             self.item = 'detector'
             self.entry = detector
-            for well in self.plate.wells.values():
-                well.ui.t2.SetLabel(well.getDetectorNames())
-                well.ui.Refresh()
+            self.refreshCanvas()
             self.Settings_entry.Clear()
             choice_list = []
             for i in self.entry:
@@ -725,11 +410,13 @@ class Plate_ui(wx.Frame):
         elif v:
             self.item = 'value'
             self.entry = []
-            for well in self.plate.wells.values():
-                well.ui.t2.SetLabel(well.getDetectorValues())
-                well.ui.Refresh()
+            self.refreshCanvas()
             self.Settings_entry.Clear()
 
+    def refreshCanvas(self):
+        if self.canvas <> None:
+            self.canvas.scheduler.invalidate()
+
     def OnEntrychange(self, e):
         self.index[self.item] = self.Settings_entry.GetCurrentSelection()
     
@@ -743,15 +430,33 @@ class Plate_ui(wx.Frame):
 
 
     def OnLeftdown(self, e):
-        self.plate.selected_rng = None
+        if self.canvas <> None:
+            self.canvas.clearSelection()
         
+    def getSelectedRange(self):
+        rect = self.selection.rect()
+        if rect == None:
+            return None
+        return Range(self.plate.getWellAt(rect[0], rect[1]),
+                     self.plate.getWellAt(rect[0] + rect[2] - 1, rect[1] + rect[3] - 1))
+
+    @instrument.timed('ui.OnUndo', gesture = True)
+    def OnUndo(self, redo = False):
+        if redo:
+            self.plate.journal.redo()
+        else:
+            self.plate.journal.undo()
+        self.refreshCanvas()
+
+    @instrument.timed('ui.OnLeftup', gesture = True)
     def OnLeftup(self, e):
-        if self.plate.selected_rng <> None:
+        selected_rng = self.getSelectedRange()
+        if selected_rng <> None:
             if self.operation == 'clear':
-                self.plate.selected_rng.clear(item = self.Operation_Clear_by.GetValue())
+                selected_rng.clear(item = self.Operation_Clear_by.GetValue())
             elif self.operation == 'fill':
                 if self.item <> 'value' :
-                    n = self.plate.selected_rng.autoFill(item = self.item,
+                    n = selected_rng.autoFill(item = self.item,
                                                      entry = self.entry,
                                                      index = self.index[self.item],
                                                      n_row = self.Settings_row.GetValue(),
@@ -761,15 +466,14 @@ class Plate_ui(wx.Frame):
                                                      iteration = self.Settings_Iteration.GetValue())
                     self.index[self.item] = n
                     self.Settings_entry.SetSelection(n)
-            for well in self.plate.selected_rng.wells:
-                well.ui.active = False
-                well.ui.update()
-            self.plate.selected_rng = None
+            self.canvas.clearSelection()
 
 def main():
-
+    # PLATE_EDITER_TRACE=editor.log turns on timing, F12 dumps it, F11 profiles the next gesture
+    if os.environ.get('PLATE_EDITER_TRACE'):
+        instrument.enable(os.environ['PLATE_EDITER_TRACE'], slow_ms = 50)
     app = wx.App()
-    a = Plate('myplate',16,24)
+    a = Plate_ui(None, Plate('myplate',16,24))
     
     #a.initui()
     #a.addWells()
@@ -1,25 +1,33 @@
-import string
 from collections import OrderedDict
+import numpy as np
+import addressing
+import blocks
+import fill
+import instrument
+import journal
 
-ROW_NAMES = list(string.ascii_uppercase)
-COLUMN_NAMES = map(str, range(1, 100))
+def encodeName(item):
+    # names are kept as utf-8 byte strings, whatever they came in as
+    if isinstance(item, unicode):
+        return item.encode('utf-8')
+    return str(item)
 
 class Experiment(object):
     def __init__(self, ID):
-        self._id = str(ID)
+        self._id = encodeName(ID)
         self._samples = OrderedDict()
         self._assays = OrderedDict()
     def addSamples(self, group, samples = None, num = 8):
         if samples:
             for sample in samples:
-                self._samples[sample] = str(group)
+                self._samples[encodeName(sample)] = encodeName(group)
         else:
             for idx in range(num):
-                self._samples[str(group) + '-' + str(idx + 1)] = str(group)
+                self._samples[encodeName(group) + '-' + str(idx + 1)] = encodeName(group)
         return self
     def addAssays(self, assays, isRef = False):
         for assay in assays:
-            self._assays[assay] = isRef
+            self._assays[encodeName(assay)] = isRef
         return self
     def get(self, item_class):
         if item_class == 's':
@@ -28,100 +36,242 @@ class Experiment(object):
             return self._samples.values()
         elif item_class == 'a':
             return self._assays.keys()
+    def isRef(self, assay):
+        return self._assays[encodeName(assay)]
 
-class Plate(object):
+NA = 'NA'
+NA_CODE = -1
+TITLES = {'s' : 'Samples', 'a' : 'Assays', 'v' : 'Values'}
+
+class Vocabulary(object):
+    def __init__(self, items = None):
+        self._items = []
+        self._codes = {}
+        if items:
+            for item in items:
+                self.encode(item)
+    def __len__(self):
+        return len(self._items)
+    def __contains__(self, item):
+        return item in self._codes
+    def items(self):
+        return list(self._items)
+    def copy(self):
+        vocab = Vocabulary()
+        vocab._items = self._items[:]
+        vocab._codes = self._codes.copy()
+        return vocab
+    def encode(self, item):
+        if item is None or item == NA:
+            return NA_CODE
+        code = self._codes.get(item)
+        if code is None:
+            code = len(self._items)
+            self._codes[item] = code
+            self._items.append(item)
+        return code
+    def decode(self, code):
+        if code < 0:
+            return NA
+        return self._items[code]
+    def encodeArray(self, items):
+        # encode each distinct item once, in order of first appearance
+        items = np.asarray(items, dtype = object)
+        uniques, first, inverse = np.unique(items.ravel(), return_index = True, return_inverse = True)
+        codes = np.empty(len(uniques), dtype = np.int32)
+        for n in np.argsort(first, kind = 'mergesort'):
+            codes[n] = self.encode(uniques[n])
+        return codes[inverse].reshape(items.shape)
+    def lookup(self):
+        # item by code; code -1 picks up the trailing 'NA'
+        return self._items + [NA]
+    def decodeArray(self, codes):
+        return np.array(self.lookup(), dtype = object)[codes]
+
+def _toValue(item):
+    if item is None or item == NA:
+        return np.nan
+    return float(item)
+
+class Plate(journal.Journaled):
     def __init__(self, ID, nrow, ncol, samples = None, assays = None, values = None):
-        self._id = str(ID)
+        self._id = encodeName(ID)
         self._nrow = nrow
         self._ncol = ncol
-        self._samples = [['NA' for dummy_col in range(self._ncol)]
-                        for dummy_row in range(self._nrow)]
-        self._assays = [['NA' for dummy_col in range(self._ncol)]
-                        for dummy_row in range(self._nrow)]
-        self._values = [['NA' for dummy_col in range(self._ncol)]
-                        for dummy_row in range(self._nrow)]
+        self.codec = addressing.codec(nrow, ncol)
+        self._vocab = {'s' : Vocabulary(), 'a' : Vocabulary()}
+        self._samples = np.full((nrow, ncol), NA_CODE, dtype = np.int32)
+        self._assays = np.full((nrow, ncol), NA_CODE, dtype = np.int32)
+        self._values = np.full((nrow, ncol), np.nan)
+        self.journal = None
         if samples:
-            for row in range(self._nrow):
-                for col in range(self._ncol):
-                    try:
-                        self._samples[row][col] = samples[row][col]
-                    except IndexError:
-                        self._samples[row][col] = 'NA'
+            self._load('s', samples)
         if assays:
-            for row in range(self._nrow):
-                for col in range(self._ncol):
-                    try:
-                        self._assays[row][col] = assays[row][col]
-                    except IndexError:
-                        self._assays[row][col] = 'NA'
+            self._load('a', assays)
         if values:
-            for row in range(self._nrow):
-                for col in range(self._ncol):
-                    try:
-                        self._values[row][col] = values[row][col]
-                    except IndexError:
-                        self._values[row][col] = 'NA'
-    def __str__(self):
-        output = self._id + ':\n'
-        output += 'Samples:\n'
-        output += '\t'.join([''] + COLUMN_NAMES[:self._ncol]) + '\n'
+            self._load('v', values)
+    def _load(self, item_class, items):
         for row in range(self._nrow):
-            output += '\t'.join(list(ROW_NAMES[row]) + self._samples[row]) + '\n'
-        output += 'Assays:\n'
-        output += '\t'.join([''] + COLUMN_NAMES[:self._ncol]) + '\n'
-        for row in range(self._nrow):
-            output += '\t'.join(list(ROW_NAMES[row]) + self._assays[row]) + '\n'
-        return output
-    def set(self, item_class, item, pos):
+            for col in range(self._ncol):
+                try:
+                    item = items[row][col]
+                except IndexError:
+                    item = NA
+                self.set(item_class, item, (row, col))
+    def _layer(self, item_class):
         if item_class == 's':
-            self._samples[pos[0]][pos[1]] = item
+            return self._samples
         elif item_class == 'a':
-            self._assays[pos[0]][pos[1]] = item
+            return self._assays
         elif item_class == 'v':
-            self._values[pos[0]][pos[1]] = item
-        elif item_class == None:
-            self._samples[pos[0]][pos[1]] = item[0]
-            self._assays[pos[0]][pos[1]] = item[1]
-            self._values[pos[0]][pos[1]] = item[2]
+            return self._values
+        raise ValueError('unknown item class: %r' % (item_class,))
+    def _encode(self, item_class, item):
+        if item_class == 'v':
+            return _toValue(item)
+        return self._vocab[item_class].encode(item)
+    def _decode(self, item_class, code):
+        if item_class == 'v':
+            return NA if np.isnan(code) else float(code)
+        return self._vocab[item_class].decode(code)
+    def _capture(self, journal, item_class, rect):
+        return journal.snapshot(self, item_class, blocks.intersect(rect, (0, 0, self._nrow, self._ncol)))
+    def rows(self, item_classes = 'sa'):
+        # __str__ one line at a time, decoding a row of cells at once
+        yield self._id + ':\n'
+        header = '\t'.join([''] + self.codec.column_names) + '\n'
+        for item_class in item_classes:
+            layer = self._layer(item_class)
+            if item_class <> 'v':
+                names = map(encodeName, self._vocab[item_class].lookup())
+            yield TITLES[item_class] + ':\n'
+            yield header
+            for row in range(self._nrow):
+                if item_class == 'v':
+                    cells = [NA if value <> value else str(value) for value in layer[row].tolist()]
+                else:
+                    cells = [names[code] for code in layer[row].tolist()]
+                yield '\t'.join([self.codec.row_names[row]] + cells) + '\n'
+    def __str__(self):
+        return ''.join(self.rows())
+    def write(self, out, item_classes = 'sa'):
+        for line in self.rows(item_classes):
+            out.write(line)
+        return self
+    def vocabulary(self, item_class):
+        return self._vocab[item_class]
+    def set(self, item_class, item, pos):
+        snapshot = self._snapshot(item_class, (pos[0], pos[1], 1, 1))
+        if item_class == None:
+            for layer_class, layer_item in zip('sav', item):
+                self._layer(layer_class)[pos[0], pos[1]] = self._encode(layer_class, layer_item)
+        else:
+            self._layer(item_class)[pos[0], pos[1]] = self._encode(item_class, item)
+        self._commit(snapshot, 'set')
         return self
     def clear(self, item_class, pos):
-        if item_class == 's':
-            self._samples[pos[0]][pos[1]] = 'NA'
-        elif item_class == 'a':
-            self._assays[pos[0]][pos[1]] = 'NA'
+        snapshot = self._snapshot(item_class, (pos[0], pos[1], 1, 1))
+        if item_class == None:
+            self._samples[pos[0], pos[1]] = NA_CODE
+            self._assays[pos[0], pos[1]] = NA_CODE
+            self._values[pos[0], pos[1]] = np.nan
         elif item_class == 'v':
-            self._values[pos[0]][pos[1]] = 'NA'
-        elif item_class == None:
-            self._samples[pos[0]][pos[1]] = 'NA'
-            self._assays[pos[0]][pos[1]] = 'NA'
-            self._values[pos[0]][pos[1]] = 'NA'
+            self._values[pos[0], pos[1]] = np.nan
+        else:
+            self._layer(item_class)[pos[0], pos[1]] = NA_CODE
+        self._commit(snapshot, 'clear')
     def get(self, item_class, pos):
-        if item_class == 's':
-            return self._samples[pos[0]][pos[1]]
-        elif item_class == 'a':
-            return self._assays[pos[0]][pos[1]]
-        elif item_class == 'v':
-            return self._values[pos[0]][pos[1]]
-        elif item_class == None:
-            return (self._samples[pos[0]][pos[1]],
-                    self._assays[pos[0]][pos[1]],
-                    self._values[pos[0]][pos[1]])
+        if item_class == None:
+            return tuple(self.get(layer_class, pos) for layer_class in 'sav')
+        return self._decode(item_class, self._layer(item_class)[pos[0], pos[1]])
+    def get_layer(self, item_class, decode = False):
+        layer = self._layer(item_class)
+        if not decode:
+            return layer.copy()
+        if item_class == 'v':
+            values = layer.astype(object)
+            values[np.isnan(layer)] = NA
+            return values
+        return self._vocab[item_class].decodeArray(layer)
+    def set_layer(self, item_class, layer, encoded = False):
+        target = self._layer(item_class)
+        layer = np.asarray(layer)
+        if layer.shape != target.shape:
+            raise ValueError('layer shape %s does not match plate shape %s'
+                             % (layer.shape, target.shape))
+        snapshot = self._snapshot(item_class, (0, 0, self._nrow, self._ncol))
+        if item_class == 'v':
+            if layer.dtype == object or layer.dtype.kind in 'SU':
+                layer = np.array([_toValue(item) for item in layer.ravel()]).reshape(target.shape)
+            target[...] = layer
+        elif encoded:
+            if layer.size and (layer.min() < NA_CODE or layer.max() >= len(self._vocab[item_class])):
+                raise ValueError('layer codes out of vocabulary range')
+            target[...] = layer
+        else:
+            target[...] = self._vocab[item_class].encodeArray(layer)
+        self._commit(snapshot, 'set_layer')
+        return self
+    def fillBlock(self, item_class, items, index_map, pos = (0, 0)):
+        # items[index_map] into the block starting at pos, skipping UNFILLED cells
+        rows = slice(pos[0], pos[0] + index_map.shape[0])
+        cols = slice(pos[1], pos[1] + index_map.shape[1])
+        mask = index_map != fill.UNFILLED
+        snapshot = self._snapshot(item_class, tuple(pos) + index_map.shape)
+        if item_class == None:
+            for n, layer_class in enumerate('sav'):
+                codes = np.array([self._encode(layer_class, item[n]) for item in items])
+                self._layer(layer_class)[rows, cols][mask] = codes[index_map[mask]]
+        else:
+            codes = np.array([self._encode(item_class, item) for item in items])
+            self._layer(item_class)[rows, cols][mask] = codes[index_map[mask]]
+        self._commit(snapshot, 'fill')
+        return self
+    def copyBlock(self, item_class, src, dst):
+        layers = [self._layer(item_class)] if item_class else [self._samples, self._assays, self._values]
+        snapshot = self._snapshot(item_class, dst)
+        if blocks.intersect(src, dst) is None or src[0] == dst[0]:
+            for layer in layers:
+                layer[dst[0]:dst[0] + dst[2], dst[1]:dst[1] + dst[3]] = \
+                    layer[src[0]:src[0] + src[2], src[1]:src[1] + src[3]]
+        else:
+            for r in blocks.order(src[0], dst[0], src[2]):
+                for layer in layers:
+                    layer[dst[0] + r, dst[1]:dst[1] + dst[3]] = layer[src[0] + r, src[1]:src[1] + src[3]]
+        self._commit(snapshot, 'copy')
+        return self
+    def clearBlock(self, item_class, rect):
+        rows = slice(rect[0], rect[0] + rect[2])
+        cols = slice(rect[1], rect[1] + rect[3])
+        snapshot = self._snapshot(item_class, rect)
+        if item_class in (None, 's'):
+            self._samples[rows, cols] = NA_CODE
+        if item_class in (None, 'a'):
+            self._assays[rows, cols] = NA_CODE
+        if item_class in (None, 'v'):
+            self._values[rows, cols] = np.nan
+        self._commit(snapshot, 'clear')
+        return self
     def clone(self):
         plate = Plate(self._id + '_clone', self._nrow, self._ncol)
-        plate._samples = [rows[:] for rows in self._samples]
-        plate._assays = [rows[:] for rows in self._assays]
-        plate._values = [rows[:] for rows in self._values]
+        plate._vocab = dict((key, vocab.copy()) for key, vocab in self._vocab.items())
+        plate._samples = self._samples.copy()
+        plate._assays = self._assays.copy()
+        plate._values = self._values.copy()
         return plate
+    def position(self, pos):
+        if isinstance(pos, basestring):
+            return self.codec.position(pos)
+        return pos
     def posInplate(self, pos):
-        try:
-            self._samples[pos[0]][pos[1]]
-        except IndexError:
-            return False
-        return True
+        return 0 <= pos[0] < self._nrow and 0 <= pos[1] < self._ncol
 
 class Range(object):
+    @instrument.timed('main3.Range.__init__')
     def __init__(self, plate, pos1, pos2):
         self._plate = plate
+        pos1 = plate.position(pos1)
+        pos2 = plate.position(pos2)
         row1 = min(pos1[0], pos2[0])
         row2 = max(pos1[0], pos2[0])
         col1 = min(pos1[1], pos2[1])
@@ -133,50 +283,41 @@ class Range(object):
         for row in range(self._startpos[0], self._startpos[0] + self._nrow):
             for col in range(self._startpos[1], self._startpos[1] + self._ncol):
                 yield (row, col)
+    @instrument.timed('main3.Range.autoFill')
     def autoFill(self, item_class = 's', itmes = [], index = 0, nrow = 2, ncol = 2, direction = 'row-wise', iteration = True):
-        nCOL = self._ncol / ncol
-        nROW = self._nrow / nrow
-        #pos_lst = {}
-        if direction == 'row-wise':
-            for C_idx in range(nCOL):
-                for R_idx in range(nROW):
-                    for c_idx in range(ncol):
-                        for r_idx in range(nrow):
-                            pos = (self._startpos[0] + R_idx*nrow + r_idx,
-                                   self._startpos[1] + C_idx*ncol + c_idx)
-                            itmes_idx = index % len(itmes)
-                            #pos_lst[pos] = index % len(itmes)
-                            self._plate.set(item_class, itmes[itmes_idx], pos)
-                    if iteration:
-                        index += 1
-        elif direction == 'col-wise':
-            for R_idx in range(nROW):
-                for C_idx in range(nCOL):
-                    for c_idx in range(ncol):
-                        for r_idx in range(nrow):
-                            pos = (self._startpos[0] + R_idx*nrow + r_idx,
-                                   self._startpos[1] + C_idx*ncol + c_idx)
-                            itmes_idx = index % len(itmes)
-                            #pos_lst[pos] = index % len(itmes)
-                            self._plate.set(item_class, itmes[itmes_idx], pos)
-                    if iteration:
-                        index += 1
-        return index % len(itmes)
+        index_map, index = fill.indexMap(self._nrow, self._ncol, nrow, ncol,
+                                         direction, iteration, index, len(itmes))
+        with self._plate.transaction('autoFill'):
+            self._plate.fillBlock(item_class, itmes, index_map, self._startpos)
+        return index
+    def rect(self):
+        return self._startpos + (self._nrow, self._ncol)
+    @instrument.timed('main3.Range.copy')
     def copy(self, new_pos, cut = False, item_class = None):
-        tmp_plate = self._plate.clone()
-        if cut:
-            self.clearall(item_class)
-        nrow = new_pos[0] - self._startpos[0]
-        ncol = new_pos[1] - self._startpos[1]
-        offset = (new_pos[0] - self._startpos[0],
-                  new_pos[1] - self._startpos[1])
-        for pos in self.positions():
-            offset_pos = (pos[0] + offset[0], pos[1] + offset[1])
-            if self._plate.posInplate(offset_pos):
-                self._plate.set(item_class, tmp_plate.get(item_class, pos), offset_pos)
+        new_pos = self._plate.position(new_pos)
+        shape = (self._plate._nrow, self._plate._ncol)
+        src = blocks.intersect(self.rect(), (0, 0) + shape)
+        moved = blocks.transfer(self.rect(), new_pos, shape)
+        dst = None
+        with self._plate.transaction('move' if cut else 'copy'):
+            if moved:
+                self._plate.copyBlock(item_class, moved[0], moved[1])
+                dst = moved[1]
+            if cut and src:
+                for strip in blocks.difference(src, dst) if dst else [src]:
+                    self._plate.clearBlock(item_class, strip)
         return self
+    @instrument.timed('main3.Range.clearall')
     def clearall(self, item_class = None):
-        for pos in self.positions():
-            self._plate.clear(item_class, pos)
+        # one block, so one undo step however many wells
+        rect = blocks.intersect(self.rect(), (0, 0, self._plate._nrow, self._plate._ncol))
+        if rect:
+            with self._plate.transaction('clearall'):
+                self._plate.clearBlock(item_class, rect)
         return self
 
+def writePlates(out, plates, item_classes = 'sa'):
+    # many plates into one file, one plate in memory as text at a time
+    for plate in plates:
+        plate.write(out, item_classes)
+    return out
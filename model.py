@@ -0,0 +1,583 @@
+from collections import OrderedDict
+import numpy as np
+import addressing
+import blocks
+import fill
+import instrument
+import journal
+
+class Sample(object):
+    __slots__ = ('name', 'group', 'wells')
+
+    def __init__(self, name):
+        self.name = name
+        self.group = None
+        self.wells = set()
+        
+    def getName(self):
+        return self.name
+    
+    def isControl(self):
+        return self.group is not None and self.group.isControl()
+    
+    def setGroup(self, group):
+        self.group = group
+        for well in self.wells:
+            well.resetGroupLabels()
+        return self
+        
+    def getGroup(self):
+        return self.group
+    
+class SampleList(object):
+    def __init__(self, name, start, n):
+        self.samples = []
+        for i in range(start, start + n):
+            sample = Sample(name + '_' + str(i))
+            self.samples.append(sample)
+            
+    def getSamples(self):
+        return self.samples
+    
+    def subset(self, start, n = 1):
+        tmp = []
+        for i in range(start, start + n):
+            try:
+                tmp.append(self.samples[i - 1])
+            except IndexError:
+                break
+        return tmp
+
+class Group(object):
+    __slots__ = ('name', 'samples', 'members', 'names', 'treatment', 'control')
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+        self.members = set()
+        self.names = {}
+        self.treatment = {}
+        self.control = False
+        
+    def addSample(self, sample):
+        if not sample in self.members:
+            self.samples.append(sample)
+            self.members.add(sample)
+            self.names.setdefault(sample.getName(), sample)
+            sample.setGroup(self)
+        return self
+            
+    def addSampleList(self, list_of_samples):
+        for sample in list_of_samples:
+            self.addSample(sample)
+        return self
+        
+    def getName(self):
+        return self.name
+    
+    def getSample(self, sample_name):
+        return self.names.get(sample_name, None)
+    
+    def getSamples(self):
+        return self.samples
+    
+    def hasSample(self, sample):
+        return sample in self.members
+    
+    def setTreatment(self, treatment, value):
+        self.treatment[treatment] = value
+        return self
+    
+    def isControl(self):
+        return self.control
+
+class Detector(object):
+    __slots__ = ('name', 'value', 'control', 'wells')
+
+    def __init__(self, name):
+        self.name = name
+        self.value = None
+        self.control = False
+        self.wells = set()
+        
+    def getName(self):
+        return self.name
+    
+    def setValue(self, value):
+        self.value = value
+        for well in self.wells:
+            well.resetValueLabels()
+        return self
+        
+    def getValue(self):
+        return self.value
+
+    def isControl(self):
+        return self.control
+    
+class Catalog(object):
+    def __init__(self):
+        self.samples = OrderedDict()
+        self.groups = OrderedDict()
+        self.detectors = OrderedDict()
+
+    def _register(self, index, item):
+        name = item.getName()
+        known = index.get(name)
+        if known is None:
+            index[name] = item
+        elif known is not item:
+            raise ValueError('duplicate name: %r' % (name,))
+        return item
+
+    def addSample(self, sample, group = None):
+        self._register(self.samples, sample)
+        if group <> None:
+            self._group(group).addSample(sample)
+        elif sample.getGroup() <> None:
+            self._register(self.groups, sample.getGroup())
+        return self
+
+    def addSamples(self, samples, group = None):
+        if group <> None:
+            group = self._group(group)
+        for sample in samples:
+            self.addSample(sample, group)
+        return self
+
+    def _group(self, group):
+        # a Group, or the name of one (created on first use)
+        if not isinstance(group, Group):
+            group = self.groups.get(group) or Group(group)
+        return self._register(self.groups, group)
+
+    def addGroup(self, group):
+        group = self._group(group)
+        for sample in group.getSamples():
+            self._register(self.samples, sample)
+        return group
+
+    def addDetector(self, detector):
+        self._register(self.detectors, detector)
+        return self
+
+    def addDetectors(self, detectors):
+        for detector in detectors:
+            self.addDetector(detector)
+        return self
+
+    def newSamples(self, group, names):
+        group = self._group(group)
+        samples = [Sample(name) for name in names]
+        self.addSamples(samples, group)
+        return samples
+
+    def newDetectors(self, names):
+        detectors = [Detector(name) for name in names]
+        self.addDetectors(detectors)
+        return detectors
+
+    def getSample(self, name):
+        return self.samples.get(name, None)
+
+    def getGroup(self, name):
+        return self.groups.get(name, None)
+
+    def getDetector(self, name):
+        return self.detectors.get(name, None)
+
+    def getSamples(self, group = None):
+        if group == None:
+            return self.samples.values()
+        if not isinstance(group, Group):
+            group = self.groups.get(group)
+            if group == None:
+                return []
+        return group.getSamples()
+
+    def getGroups(self):
+        return self.groups.values()
+
+    def getDetectors(self):
+        return self.detectors.values()
+
+    def hasSample(self, sample):
+        return self.samples.get(sample.getName()) is sample
+
+    def hasDetector(self, detector):
+        return self.detectors.get(detector.getName()) is detector
+
+class Well(object):
+    __slots__ = ('address', 'omit', 'plate', 'samples', 'detectors', 'values',
+                 'sample_names', 'group_names', 'detector_names', 'detector_values')
+
+    def __init__(self, address, plate):
+        self.address = address
+        self.omit = False
+        self.plate = plate
+        self.samples = set()
+        self.detectors = set()
+        self.values = None
+        self.sample_names = self.group_names = None
+        self.detector_names = self.detector_values = None
+
+#
+    def addSample(self, sample):
+        self.samples.add(sample)
+        sample.wells.add(self)
+        self.resetSampleLabels()
+        return self
+    def addDetector(self, detector):
+        self.detectors.add(detector)
+        detector.wells.add(self)
+        self.resetDetectorLabels()
+        return self
+    def removeSample(self, sample):
+        self.samples.discard(sample)
+        sample.wells.discard(self)
+        self.resetSampleLabels()
+        return self
+    def removeDetector(self, detector):
+        self.detectors.discard(detector)
+        detector.wells.discard(self)
+        if self.values:
+            self.values.pop(detector, None)
+        self.resetDetectorLabels()
+        return self
+    def clearSamples(self):
+        for sample in self.samples:
+            sample.wells.discard(self)
+        self.samples.clear()
+        self.resetSampleLabels()
+        return self
+    def clearDetectors(self):
+        for detector in self.detectors:
+            detector.wells.discard(self)
+            if self.values:
+                self.values.pop(detector, None)
+        self.detectors.clear()
+        if not self.values:
+            self.values = None
+        self.resetDetectorLabels()
+        return self
+    def setValue(self, detector, value):
+        # measured value of detector in this well, shadows detector.value
+        if self.values is None:
+            self.values = {}
+        self.values[detector] = value
+        self.resetValueLabels()
+        return self
+    def getValue(self, detector):
+        if self.values and detector in self.values:
+            return self.values[detector]
+        return detector.getValue()
+    def clearAll(self):
+        self.clearSamples()
+        self.clearDetectors()
+        return self
+    def copySamplesTo(self, new_well):
+        if new_well is self:
+            return self
+        new_well.clearSamples()
+        for sample in self.samples:
+            new_well.addSample(sample)
+        return self
+    def copyDetectorsTo(self, new_well):
+        if new_well is self:
+            return self
+        new_well.clearDetectors()
+        for detector in self.detectors:
+            new_well.addDetector(detector)
+            if self.values and detector in self.values:
+                new_well.setValue(detector, self.values[detector])
+        return self
+    def copyAllTo(self, new_well):
+        self.copySamplesTo(new_well)
+        self.copyDetectorsTo(new_well)
+        return self
+    def moveSamplesTo(self, new_well):
+        new_well.clearSamples()
+        for sample in self.samples:
+            new_well.addSample(sample)
+        self.clearSamples()
+        return self
+    def moveDetectorsTo(self, new_well):
+        if new_well is self:
+            return self
+        new_well.clearDetectors()
+        for detector in self.detectors:
+            new_well.addDetector(detector)
+            if self.values and detector in self.values:
+                new_well.setValue(detector, self.values[detector])
+        self.clearDetectors()
+        return self
+    def moveAllTo(self, new_well):
+        self.moveSamplesTo(new_well)
+        self.moveDetectorsTo(new_well)
+        return self
+    def exclude(self):
+        self.omit = True
+        self.touch()
+        return self
+    def include(self):
+        self.omit = False
+        self.touch()
+        return self
+    def touch(self):
+        # tell the plate's tracker (analysis.Tracker) this well changed; the
+        # label resets below run on every such change and do the same inline
+        if self.plate.tracker is not None:
+            self.plate.tracker.touch(self)
+    def resetSampleLabels(self):
+        self.sample_names = None
+        self.group_names = None
+        if self.plate.tracker is not None:
+            self.plate.tracker.touch(self)
+    def resetGroupLabels(self):
+        self.group_names = None
+        if self.plate.tracker is not None:
+            self.plate.tracker.touch(self)
+    def resetDetectorLabels(self):
+        self.detector_names = None
+        self.detector_values = None
+        if self.plate.tracker is not None:
+            self.plate.tracker.touch(self)
+    def resetValueLabels(self):
+        self.detector_values = None
+        if self.plate.tracker is not None:
+            self.plate.tracker.touch(self)
+    def getSampleNames(self):
+        if self.sample_names == None:
+            self.sample_names = ''.join([i.getName() + ';' for i in self.samples]) or 'NA'
+        return self.sample_names
+    def getGroupNames(self):
+        if self.group_names == None:
+            # 'NA;' for a sample without a group, e.g. one read from a main3 table
+            self.group_names = ''.join([(i.getGroup().getName() if i.getGroup() else 'NA') + ';'
+                                        for i in self.samples]) or 'NA'
+        return self.group_names
+    def getDetectorNames(self):
+        if self.detector_names == None:
+            self.detector_names = ''.join([i.getName() + ';' for i in self.detectors]) or 'NA'
+        return self.detector_names
+    def getDetectorValues(self):
+        if self.detector_values == None:
+            self.detector_values = ''.join([i.getName() + ':' + str(self.getValue(i)) + ';'
+                                            for i in self.detectors]) or 'NA'
+        return self.detector_values
+    def offset(self, n_rows, n_columns):
+        r, c = self.plate.codec.position(self.address)
+        return self.plate.getWellAt(r + n_rows, c + n_columns)
+
+LABELS = {'address' : lambda well: well.address,
+          'sample' : Well.getSampleNames,
+          'group' : Well.getGroupNames,
+          'detector' : Well.getDetectorNames,
+          'value' : Well.getDetectorValues}
+TITLES = {'address' : 'Addresses', 'sample' : 'Samples', 'group' : 'Groups',
+          'detector' : 'Detectors', 'value' : 'Values'}
+
+class Plate(journal.Journaled):
+    def __init__(self, name = 'Plate', n_rows = 8, n_columns = 12):
+        self.name = name
+        self.n_rows = n_rows
+        self.n_columns = n_columns
+        self.codec = addressing.codec(n_rows, n_columns)
+        self.ui = None
+        self.journal = None
+        self.tracker = None
+        self.wells = {}
+        for address in self.codec.names:
+            self.wells[address] = Well(address, self)
+
+    def fillBlock(self, item, entry, index_map, start_well, fill_by = 'replace'):
+        if item.lower() == 'sample':
+            clear, add = Well.clearSamples, Well.addSample
+        elif item.lower() == 'detector':
+            clear, add = Well.clearDetectors, Well.addDetector
+        else:
+            return self
+        j0, i0 = self.codec.position(start_well.address)
+        rows, cols = np.nonzero(index_map != fill.UNFILLED)
+        for j, i, k in zip(rows, cols, index_map[rows, cols]):
+            well = self.wells[self.codec.name(j0 + j, i0 + i)]
+            if fill_by == 'replace':
+                clear(well)
+            add(well, entry[k])
+        return self
+
+    def wellsIn(self, rect):
+        rect = blocks.intersect(rect, (0, 0, self.n_rows, self.n_columns))
+        if rect is None:
+            return []
+        return [self.getWellAt(row, column)
+                for row in range(rect[0], rect[0] + rect[2])
+                for column in range(rect[1], rect[1] + rect[3])]
+    def _capture(self, journal, wells):
+        return journal.snapshotWells(wells)
+    def getName(self):
+        return self.name
+    def getNrows(self):
+        return self.n_rows
+    def getNcols(self):
+        return self.n_columns
+    def getRow_names(self):
+        return self.codec.row_names
+    def getColumn_names(self):
+        return self.codec.column_names
+    def getWell(self, address):
+        return self.wells.get(address.upper(), None)    
+    def getWellAt(self, row, column):
+        address = self.codec.name(row, column)
+        if address is None:
+            return None
+        return self.wells[address]
+    def wellInPlate(self, well):
+        return well.plate == self    
+    def rangeInPlate(self, myRange):
+        return myRange.plate == self
+
+class Range(object):
+    @instrument.timed('model.Range.__init__')
+    def __init__(self, start_well, end_well):
+        self.plate = start_well.plate
+        self.wells = set()
+        column_names = self.plate.getColumn_names()
+        row_names = self.plate.getRow_names()
+        j1, i1 = self.plate.codec.position(start_well.address)
+        j2, i2 = self.plate.codec.position(end_well.address)
+        i0 = min(i1, i2)
+        j0 = min(j1, j2)
+        self.start_well = self.plate.getWell(row_names[j0] + column_names[i0])
+        self.start_row = j0
+        self.start_column = i0
+        self.n_rows = abs(j1 - j2) + 1
+        self.n_columns = abs(i1 - i2) + 1
+        self.column_names = column_names[i0 : (i0 + self.n_columns)]
+        self.row_names = row_names[j0 : (j0 + self.n_rows)]
+        for i in range(self.n_columns):
+            for j in range(self.n_rows):
+                well = self.start_well.offset(j, i)
+                self.wells.add(well)
+
+    def getPlate(self):
+        return self.plate
+    def getRow_names(self):
+        return self.row_names    
+    def getColumn_names(self):
+        return self.column_names    
+    def getWell(self, address):
+        return self.plate.wells.get(address.upper(), None)    
+    def getStartWell(self):
+        return self.start_well
+    
+    def wellInRange(self, well):
+        return well in self.wells
+    
+    def rangeInRange(self, myRange):
+        if myRange.plate <> self.plate:
+            return False
+        for well in myRange.wells:
+            if not self.wellInRange(well):
+                return False
+        return True
+    
+    def rows(self, item = 'address'):
+        # show() one line at a time, header first
+        label = LABELS.get(item.lower(), lambda well: '')
+        yield '\t' + '\t'.join(self.getColumn_names()) + '\n'
+        for j in range(self.n_rows):
+            wells = [self.plate.getWellAt(self.start_row + j, self.start_column + i)
+                     for i in range(self.n_columns)]
+            yield self.getRow_names()[j] + '\t' + ''.join([label(well) + '\t' for well in wells]) + '\n'
+
+    def show(self, item = 'address'):
+        return ''.join(self.rows(item))
+
+    def write(self, out, item = 'address'):
+        for line in self.rows(item):
+            out.write(line)
+        return self
+    
+    def offset(self, n_rows, n_columns):
+        start_well = self.getStartWell().offset(n_rows, n_columns)
+        end_well = self.getStartWell().offset(self.n_rows - 1, self.n_columns - 1).offset(n_rows, n_columns)
+        if start_well == None:
+            return None
+        elif end_well == None:
+            return None
+        else:
+            return Range(start_well, end_well)
+        
+    @instrument.timed('model.Range.autoFill')
+    def autoFill(self, item = 'sample', entry = [], index = 0, n_row = 2, n_column = 2, direction = 1, fill_by = 'replace', iteration = True, s_shape = False):
+        index_map, index = fill.indexMap(self.n_rows, self.n_columns, n_row, n_column,
+                                         direction, iteration, index, len(entry))
+        snapshot = self.plate._snapshot(self.plate.wellsIn(self.rect()))
+        self.plate.fillBlock(item, entry, index_map, self.getStartWell(), fill_by)
+        self.plate._commit(snapshot, 'autoFill')
+        return index
+
+    def rect(self):
+        return (self.start_row, self.start_column, self.n_rows, self.n_columns)
+
+    @instrument.timed('model.Range.copyTo')
+    def copyTo(self, new_range, item = 'all'):
+        self.transferTo(new_range, item)
+
+    @instrument.timed('model.Range.moveTo')
+    def moveTo(self, new_range, item = 'all'):
+        self.transferTo(new_range, item, cut = True)
+
+    def transferTo(self, new_range, item = 'all', cut = False):
+        if item.lower() == 'all':
+            copy, clear = Well.copyAllTo, Well.clearAll
+        elif item.lower() == 'sample':
+            copy, clear = Well.copySamplesTo, Well.clearSamples
+        elif item.lower() == 'detector':
+            copy, clear = Well.copyDetectorsTo, Well.clearDetectors
+        else:
+            return self
+        dst_plate = new_range.plate
+        moved = blocks.transfer(self.rect(), new_range.rect()[:2],
+                                (self.plate.n_rows, self.plate.n_columns),
+                                (dst_plate.n_rows, dst_plate.n_columns))
+        dst = None
+        wells = dst_plate.wellsIn(moved[1]) if moved else []
+        if cut:
+            wells += self.plate.wellsIn(self.rect())
+        snapshot = self.plate._snapshot(wells)
+        if moved:
+            for src_cell, dst_cell in blocks.cells(*moved):
+                copy(self.plate.getWellAt(*src_cell), dst_plate.getWellAt(*dst_cell))
+            if dst_plate is self.plate:
+                dst = moved[1]
+        if cut:
+            for strip in blocks.difference(self.rect(), dst) if dst else [self.rect()]:
+                for row in range(strip[0], strip[0] + strip[2]):
+                    for column in range(strip[1], strip[1] + strip[3]):
+                        clear(self.plate.getWellAt(row, column))
+        self.plate._commit(snapshot, 'move' if cut else 'copy')
+        return self
+
+    @instrument.timed('model.Range.clear')
+    def clear(self, item = 'all'):
+        snapshot = self.plate._snapshot(self.wells)
+        for well in self.wells:
+            if item.lower() == 'all':
+                well.clearAll()
+            elif item.lower() == 'sample':
+                well.clearSamples()
+            elif item.lower() == 'detector':
+                well.clearDetectors()
+        self.plate._commit(snapshot, 'clear')
+
+def writePlates(out, plates, items = ('sample', 'detector')):
+    # every plate as 'name:' then one titled grid per item, e.g. 'Samples:'
+    for plate in plates:
+        whole = Range(plate.getWellAt(0, 0), plate.getWellAt(plate.n_rows - 1, plate.n_columns - 1))
+        out.write(plate.getName() + ':\n')
+        for item in items:
+            out.write(TITLES.get(item.lower(), item) + ':\n')
+            whole.write(out, item)
+    return out
@@ -0,0 +1,85 @@
+import numpy as np
+import main3
+
+# A plate is a run of slots, each slot being `replicates` adjacent wells of one
+# row holding one sample x assay. Every sample needs all its target assays;
+# wherever some of its targets go, its reference assays go too.
+
+def slotsPerPlate(nrow, ncol, replicates):
+    if replicates < 1 or replicates > ncol:
+        raise ValueError('%d replicates do not fit a row of %d wells' % (replicates, ncol))
+    return nrow * (ncol // replicates)
+
+def pack(samples, targets, refs, capacity):
+    # first fit over the open plates; a sample that fits nowhere is split,
+    # its first targets (with the refs) topping up the emptiest open plate
+    # -> [[(sample, assays), ...] per plate]
+    n_refs = len(refs)
+    smallest = n_refs + (1 if targets else 0)
+    if smallest > capacity:
+        raise ValueError('%d reference assays leave no room on a %d slot plate' % (n_refs, capacity))
+    plates = []
+    free = []
+    open_plates = []
+    for sample in samples:
+        pending = list(targets)
+        while True:
+            need = len(pending) + n_refs
+            fit = None
+            for n in open_plates:
+                if free[n] >= need:
+                    fit = n
+                    break
+            if fit is None and targets and open_plates:
+                # cheaper to repeat the refs than to leave the space empty
+                fit = max(open_plates, key = lambda n: (free[n], -n))
+            if fit is None:
+                fit = len(plates)
+                plates.append([])
+                free.append(capacity)
+                open_plates.append(fit)
+            take = min(len(pending), free[fit] - n_refs)
+            plates[fit].append((sample, pending[:take] + list(refs)))
+            free[fit] -= take + n_refs
+            pending = pending[take:]
+            if free[fit] < smallest:
+                open_plates.remove(fit)
+            if not pending:
+                break
+    return plates
+
+def layout(ID, slots, nrow, ncol, replicates):
+    # one main3.Plate from the (sample, assays) runs of pack()
+    samples = np.full((nrow, ncol), main3.NA, dtype = object)
+    assays = np.full((nrow, ncol), main3.NA, dtype = object)
+    per_row = ncol // replicates
+    n = 0
+    for sample, run in slots:
+        for assay in run:
+            row, col = divmod(n, per_row)
+            col *= replicates
+            samples[row, col:col + replicates] = sample
+            assays[row, col:col + replicates] = assay
+            n += 1
+    plate = main3.Plate(ID, nrow, ncol)
+    plate.set_layer('s', samples)
+    plate.set_layer('a', assays)
+    return plate
+
+def plan(experiment, nrow = 8, ncol = 12, replicates = 3):
+    # fewest plates holding every sample x assay x replicate of experiment
+    assays = experiment.get('a')
+    if not assays:
+        raise ValueError('experiment %s has no assays' % experiment._id)
+    targets = [assay for assay in assays if not experiment.isRef(assay)]
+    refs = [assay for assay in assays if experiment.isRef(assay)]
+    capacity = slotsPerPlate(nrow, ncol, replicates)
+    plates = pack(experiment.get('s'), targets, refs, capacity)
+    return [layout('%s-%d' % (experiment._id, n + 1), slots, nrow, ncol, replicates)
+            for n, slots in enumerate(plates)]
+
+def lowerBound(experiment, nrow = 8, ncol = 12, replicates = 3):
+    # plates needed if no sample ever had to be split
+    capacity = slotsPerPlate(nrow, ncol, replicates)
+    slots = len(experiment.get('s')) * len(experiment.get('a'))
+    return -(-slots // capacity)
@@ -0,0 +1,163 @@
+import csv
+import numpy as np
+import addressing
+from model import Catalog, Detector
+
+# header aliases, first match wins
+WELL_COLUMNS = ('well position', 'well', 'pos', 'position')
+TARGET_COLUMNS = ('target name', 'target', 'detector name', 'detector', 'assay', 'gene')
+VALUE_COLUMNS = ('ct', 'cq', 'cp', 'c\xd1\x82', 'c\xcf\x84')
+SAMPLE_COLUMNS = ('sample name', 'sample')
+
+class RawDataError(Exception):
+    pass
+
+def _clean(field):
+    return field.strip().strip('"').strip().lower()
+
+def _find(header, names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+def _toValue(field):
+    # 'Undetermined', '', 'NA' and friends have no value
+    try:
+        return float(field)
+    except ValueError:
+        return None
+
+def _address(field, codec):
+    # 'A1', 'A01', 'a1' or a 1-based well number
+    field = field.strip()
+    if field.isdigit():
+        n = int(field) - 1
+        if 0 <= n < len(codec.names):
+            return codec.names[n]
+        return None
+    row, col = addressing.split(field)
+    idx = codec.linear(row + col.lstrip('0'))
+    if idx is None:
+        return None
+    return codec.names[idx]
+
+def readHeader(stream):
+    # skip the instrument preamble up to the results header
+    for line in iter(stream.readline, ''):
+        delimiter = '\t' if '\t' in line else ','
+        header = [_clean(field) for field in line.rstrip('\r\n').split(delimiter)]
+        well = _find(header, WELL_COLUMNS)
+        value = _find(header, VALUE_COLUMNS)
+        if well is not None and value is not None:
+            return delimiter, (well, _find(header, TARGET_COLUMNS), value,
+                               _find(header, SAMPLE_COLUMNS))
+    raise RawDataError('no well and Ct/Cq header found')
+
+def readRecords(stream, stats = None):
+    # yields (well, target, value, sample) one row at a time; rows too short
+    # for the header are counted in stats['short']
+    delimiter, columns = readHeader(stream)
+    well, target, value, sample = columns
+    width = max(column for column in columns if column is not None) + 1
+    for row in csv.reader(stream, delimiter = delimiter):
+        if not row:
+            continue
+        if row[0].startswith('['):
+            # next section of the export
+            break
+        if len(row) < width:
+            if stats is not None:
+                stats['short'] = stats.get('short', 0) + 1
+            continue
+        yield (row[well],
+               row[target].strip() if target is not None else None,
+               _toValue(row[value]),
+               row[sample].strip() if sample is not None else None)
+
+def _open(source):
+    if isinstance(source, basestring):
+        return open(source, 'rb'), True
+    return source, False
+
+def loadWells(plate, source, detectors = None, create = True):
+    # fills Well.values of a model.Plate, adding detectors (and samples when
+    # detectors is a Catalog) to the wells they were measured in
+    if detectors is None:
+        detectors = {}
+    catalog = detectors if isinstance(detectors, Catalog) else None
+    lookup = catalog.getDetector if catalog else detectors.get
+    codec = plate.codec
+    addresses = {}
+    stats = {'rows' : 0, 'loaded' : 0, 'skipped' : 0, 'short' : 0}
+    stream, close = _open(source)
+    try:
+        for field, target, value, sample_name in readRecords(stream, stats):
+            stats['rows'] += 1
+            address = addresses.get(field)
+            if address is None:
+                address = addresses[field] = _address(field, codec) or ''
+            detector = lookup(target) if target else None
+            if detector is None and target and create:
+                detector = Detector(target)
+                if catalog:
+                    catalog.addDetector(detector)
+                else:
+                    detectors[target] = detector
+            if not address or detector is None:
+                stats['skipped'] += 1
+                continue
+            well = plate.wells[address]
+            if detector not in well.detectors:
+                well.addDetector(detector)
+            well.setValue(detector, value)
+            if catalog and sample_name:
+                sample = catalog.getSample(sample_name)
+                if sample is not None and sample not in well.samples:
+                    well.addSample(sample)
+            stats['loaded'] += 1
+    finally:
+        if close:
+            stream.close()
+    return stats
+
+def loadLayers(plate, source):
+    # fills the layers of a main3.Plate, one target per well so the last
+    # row of a multiplexed well wins; each layer is written once at the end
+    codec = plate.codec
+    positions = {}
+    cells = {'s' : {}, 'a' : {}, 'v' : {}}
+    stats = {'rows' : 0, 'loaded' : 0, 'skipped' : 0, 'short' : 0}
+    stream, close = _open(source)
+    try:
+        for field, target, value, sample_name in readRecords(stream, stats):
+            stats['rows'] += 1
+            pos = positions.get(field)
+            if pos is None:
+                address = _address(field, codec)
+                pos = positions[field] = codec.position(address) if address else ()
+            if not pos:
+                stats['skipped'] += 1
+                continue
+            if sample_name:
+                cells['s'][pos] = sample_name
+            if target:
+                cells['a'][pos] = target
+            cells['v'][pos] = value
+            stats['loaded'] += 1
+    finally:
+        if close:
+            stream.close()
+    with plate.transaction('load'):
+        for item_class in 'sav':
+            items = cells[item_class]
+            if not items:
+                continue
+            rows, cols = np.array(items.keys(), dtype = np.intp).T
+            layer = plate.get_layer(item_class)
+            if item_class == 'v':
+                layer[rows, cols] = np.array(items.values(), dtype = np.float64)
+            else:
+                layer[rows, cols] = plate.vocabulary(item_class).encodeArray(items.values())
+            plate.set_layer(item_class, layer, encoded = True)
+    return stats
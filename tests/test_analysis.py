@@ -0,0 +1,144 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np
+import analysis
+import columnar
+import journal
+import model
+
+FIELDS = ('ct', 'ct_sd', 'n', 'dct', 'dct_sd', 'ddct', 'ddct_sd', 'fold', 'fold_low', 'fold_high')
+
+def experiment(n_plates = 2, sd = 0.3):
+    # 12 samples (4 controls) x 3 detectors in triplicate per 16 x 24 plate
+    np.random.seed(0)
+    catalog = model.Catalog()
+    samples = catalog.newSamples('treated', ['t%d' % n for n in range(8)])
+    samples += catalog.newSamples('ctrl', ['c%d' % n for n in range(4)])
+    catalog.getGroup('ctrl').control = True
+    detectors = catalog.newDetectors(['T1', 'T2', 'R'])
+    plates = []
+    for n in range(n_plates):
+        plate = model.Plate('P%d' % n, 16, 24)
+        whole = model.Range(plate.getWellAt(0, 0), plate.getWellAt(15, 23))
+        whole.autoFill('sample', samples[n * 5:] + samples[:n * 5], n_row = 1, n_column = 9)
+        whole.autoFill('detector', detectors, n_row = 1, n_column = 3)
+        for well in plate.wellsIn((0, 0, 16, 24)):
+            for detector in well.detectors:
+                well.setValue(detector, np.random.normal(25, sd))
+        plates.append(plate)
+    return catalog, samples, detectors, plates
+
+class TrackerTest(unittest.TestCase):
+    def assertMatchesBatch(self, tracker, catalog, plates):
+        batch = analysis.ddct(columnar.table(plates), ['R'], ['ctrl'])
+        rows = list(tracker.rows())
+        self.assertEqual(sorted([row[:2] for row in rows]), sorted([row[:2] for row in batch.rows()]))
+        for sample, detector, fold, low, high in rows:
+            expected = batch.get(sample, detector)
+            result = tracker.result(catalog.getSample(sample), catalog.getDetector(detector))
+            for field in FIELDS:
+                np.testing.assert_allclose(result[field], expected[field], err_msg = field)
+
+    def testRandomEditsMatchBatch(self):
+        catalog, samples, detectors, plates = experiment()
+        tracker = analysis.Tracker(plates, ['R'], ['ctrl'])
+        self.assertMatchesBatch(tracker, catalog, plates)
+        undo = journal.Journal().attach(plates[0])
+        random.seed(5)
+        plate = plates[0]
+        for step in range(60):
+            row, column = random.randrange(14), random.randrange(20)
+            rng = model.Range(plate.getWellAt(row, column), plate.getWellAt(row + 1, column + 3))
+            edit = random.randrange(8)
+            if edit == 0:
+                rng.clear(random.choice(['all', 'sample', 'detector']))
+            elif edit == 1:
+                rng.autoFill('sample', random.sample(samples, 3), n_row = 1, n_column = 2)
+            elif edit == 2:
+                rng.copyTo(model.Range(random.choice(plates).getWellAt(5, 5), plate.getWellAt(6, 8)))
+            elif edit == 3:
+                rng.moveTo(model.Range(plate.getWellAt(random.randrange(14), 1), plate.getWellAt(15, 4)))
+            elif edit == 4:
+                well = random.choice(list(rng.wells))
+                well.exclude() if random.random() < 0.5 else well.include()
+            elif edit == 5:
+                undo.undo()
+            elif edit == 6:
+                random.choice(samples).setGroup(catalog.getGroup(random.choice(['treated', 'ctrl'])))
+            else:
+                well = random.choice(list(rng.wells))
+                for detector in well.detectors:
+                    well.setValue(detector, np.random.normal(25, 1))
+            if step % 10 == 9:
+                self.assertMatchesBatch(tracker, catalog, plates)
+        self.assertMatchesBatch(tracker, catalog, plates)
+
+    def testControlTargetEditUpdatesCalibrator(self):
+        catalog, samples, detectors, plates = experiment()
+        tracker = analysis.Tracker(plates, ['R'], ['ctrl'])
+        self.assertMatchesBatch(tracker, catalog, plates)
+        well = [well for well in plates[0].wellsIn((0, 0, 16, 24))
+                if well.samples and list(well.samples)[0].isControl() and
+                list(well.detectors)[0].getName() == 'T1'][0]
+        well.setValue(list(well.detectors)[0], 30.0)
+        self.assertMatchesBatch(tracker, catalog, plates)
+        well.exclude()
+        self.assertMatchesBatch(tracker, catalog, plates)
+
+    def testSingleEditRecomputesOnlyItsPair(self):
+        catalog, samples, detectors, plates = experiment()
+        tracker = analysis.Tracker(plates, ['R'], ['ctrl'])
+        list(tracker.rows())
+        well = plates[1].getWellAt(3, 4)
+        sample, = well.samples
+        detector, = well.detectors
+        cached = dict(tracker.aggregates)
+        well.setValue(detector, 40.0)
+        self.assertEqual(tracker.dirty, set([well]))
+        tracker.stats(sample, detector)
+        changed = [pair for pair in cached if tracker.aggregates.get(pair) is not cached[pair]]
+        self.assertEqual(changed, [(sample, detector)])
+
+class OutlierTest(unittest.TestCase):
+    def testRulesFindPlantedOutlier(self):
+        catalog, samples, detectors, plates = experiment(sd = 0.05)
+        bad = plates[0].getWellAt(2, 2)
+        for detector in bad.detectors:
+            bad.setValue(detector, 28.0)
+        manual = plates[1].getWellAt(0, 0).exclude()
+        index = analysis.ReplicateIndex(plates)
+        for rule in ('median', 'mad', 'grubbs'):
+            explanations = index.outliers(rule)
+            self.assertIn(bad, explanations)
+            self.assertTrue(bad.omit)
+            self.assertTrue(manual.omit)
+        # rerun with a loose limit restores what it omitted, not manual omits
+        self.assertEqual(index.outliers('median', threshold = 100), {})
+        self.assertFalse(bad.omit)
+        self.assertTrue(manual.omit)
+
+    def testGrubbsCriticalValues(self):
+        # two-sided, alpha 0.05, from the published table
+        for n, expected in ((3, 1.1543), (10, 2.2900), (20, 2.7082), (100, 3.3841)):
+            self.assertAlmostEqual(analysis.grubbsCritical(n), expected, places = 3)
+
+    def testIndexStatsMatchColumnar(self):
+        catalog, samples, detectors, plates = experiment()
+        plates[0].getWellAt(0, 0).exclude()
+        stats = analysis.ReplicateIndex(plates).stats()
+        columns = columnar.table(plates)
+        mean, sd, counts = analysis.replicates(columns)
+        names = columns['samples'].tolist()
+        assays = columns['assays'].tolist()
+        for row in stats:
+            s, a = names.index(row['sample']), assays.index(row['detector'])
+            self.assertEqual(row['count'], counts[s, a])
+            np.testing.assert_allclose([row['mean'], row['sd']], [mean[s, a], sd[s, a]])
+
+if __name__ == '__main__':
+    unittest.main()
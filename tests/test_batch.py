@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import batch
+import columnar
+
+MANIFEST = {u'plate' : {u'rows' : 8, u'columns' : 12, u'replicates' : 2},
+            u'experiments' : [{u'id' : u'Eé1',
+                               u'samples' : [{u'group' : u'TNFα', u'samples' : [u'TNFα-1', u'TNFα-2']},
+                                             {u'group' : u'Naive', u'num' : 2}],
+                               u'assays' : [{u'assays' : [u'Tbp'], u'ref' : True},
+                                            {u'assays' : [u'Il1β']}]}]}
+
+class UnicodeManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.directory, 'manifest.json')
+        out = open(self.manifest, 'w')
+        json.dump(MANIFEST, out)
+        out.close()
+        self.output = os.path.join(self.directory, 'layouts')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_batch(self, kind):
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            return batch.main([self.manifest, '-o', self.output, '-j', '1', '--format', kind])
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    def testNpz(self):
+        self.assertEqual(self.run_batch('npz'), 0)
+        columns = columnar.load(os.path.join(self.output, 'E\xc3\xa91.npz'))
+        self.assertIn('TNF\xce\xb1-1', columns['samples'].tolist())
+        self.assertIn('Il1\xce\xb2', columns['assays'].tolist())
+
+    def testGrid(self):
+        self.assertEqual(self.run_batch('grid'), 0)
+        text = open(os.path.join(self.output, 'E\xc3\xa91.txt')).read()
+        self.assertIn('TNF\xce\xb1-2', text)
+        self.assertIn('Il1\xce\xb2', text)
+
+if __name__ == '__main__':
+    unittest.main()
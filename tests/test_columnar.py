@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np
+import analysis
+import columnar
+import main3
+import model
+
+def mixedPlates():
+    # a main3 plate and a model plate sharing sample s1
+    catalog = model.Catalog()
+    s1, = catalog.newSamples('ctrl', ['s1'])
+    s2, = catalog.newSamples('treated', ['s2'])
+    catalog.getGroup('ctrl').control = True
+    tbp, gapdh = catalog.newDetectors(['Tbp', 'Gapdh'])
+    m = model.Plate('M', 2, 3)
+    for column, (detector, value) in enumerate([(tbp, 20.5), (gapdh, 25.0), (tbp, 20.5)]):
+        m.getWellAt(0, column).addSample(s1).addDetector(detector).setValue(detector, value)
+        m.getWellAt(1, column).addSample(s2).addDetector(detector).setValue(detector, value + 1)
+    p = main3.Plate('P', 1, 2)
+    p.set(None, ('s1', 'Tbp', 20.5), (0, 0))
+    p.set(None, ('s1', 'Gapdh', 25.0), (0, 1))
+    return m, p
+
+class GroupTest(unittest.TestCase):
+    def testGroupsWhateverThePlateOrder(self):
+        m, p = mixedPlates()
+        for plates in ([m, p], [p, m]):
+            columns = columnar.table(plates)
+            groups = dict(zip(columns['samples'].tolist(),
+                              [columns['groups'][code] for code in columns['sample_group']]))
+            self.assertTrue((columns['sample_group'] >= 0).all())
+            self.assertEqual(groups, {'s1' : 'ctrl', 's2' : 'treated'})
+            result = analysis.analyse(plates, ['Tbp'], ['ctrl'])
+            self.assertAlmostEqual(result.get('s1', 'Tbp')['ct'], 20.5)
+            self.assertAlmostEqual(result.get('s1', 'Gapdh')['dct'], 4.5)
+            self.assertAlmostEqual(result.get('s2', 'Gapdh')['ddct'], 0.0)
+
+    def testMain3TableToModelHasNoGroups(self):
+        m, p = mixedPlates()
+        plates, catalog = columnar.toModel(columnar.table([p]))
+        well = plates[0].getWell('A1')
+        self.assertEqual(well.getSampleNames(), 's1;')
+        self.assertEqual(well.getGroupNames(), 'NA;')
+        whole = model.Range(well, plates[0].getWell('A2'))
+        self.assertIn('NA;', whole.show('group'))
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameTable(self, columns, loaded):
+        self.assertEqual(sorted(columns), sorted(loaded))
+        for name in columns:
+            np.testing.assert_array_equal(columns[name], loaded[name])
+
+    def testSaveLoad(self):
+        m, p = mixedPlates()
+        columns = columnar.table([p, m])
+        for name in ('plates.npz', 'plates'):
+            path = columnar.save(os.path.join(self.directory, name), [p, m])
+            self.assertSameTable(columns, columnar.load(path))
+
+    def testNpzIsDeterministic(self):
+        m, p = mixedPlates()
+        first = open(columnar.save(os.path.join(self.directory, 'a.npz'), [p, m]), 'rb').read()
+        second = open(columnar.save(os.path.join(self.directory, 'b.npz'), [p, m]), 'rb').read()
+        self.assertEqual(first, second)
+
+    def testToPlates(self):
+        m, p = mixedPlates()
+        back = columnar.toPlates(columnar.table([p, m]))
+        self.assertEqual(str(back[0]), str(p))
+        self.assertEqual(back[1].get(None, (1, 1)), ('s2', 'Gapdh', 26.0))
+
+    def testToModel(self):
+        m, p = mixedPlates()
+        plates, catalog = columnar.toModel(columnar.table([m]))
+        self.assertSameTable(columnar.table([m]), columnar.table(plates))
+        self.assertEqual(catalog.getSample('s2').getGroup().getName(), 'treated')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import fill
+import main3
+import model
+
+def walk(nrow, ncol, block_nrow, block_ncol, direction, iteration, index, n_items):
+    # block by block, the way the editor fills a drag
+    index_map = [[fill.UNFILLED] * ncol for row in range(nrow)]
+    blocks = [(R, C) for C in range(ncol // block_ncol) for R in range(nrow // block_nrow)]
+    if direction in fill.COL_WISE:
+        blocks.sort()
+    for n, (R, C) in enumerate(blocks):
+        item = (index + n if iteration else index) % n_items
+        for row in range(R * block_nrow, (R + 1) * block_nrow):
+            for col in range(C * block_ncol, (C + 1) * block_ncol):
+                index_map[row][col] = item
+    return index_map, (index + len(blocks) if iteration else index) % n_items
+
+class IndexMapTest(unittest.TestCase):
+    def testMatchesBlockWalk(self):
+        random.seed(7)
+        for trial in range(500):
+            args = (random.randint(1, 16), random.randint(1, 24), random.randint(1, 5), random.randint(1, 5),
+                    random.choice(['row-wise', 'col-wise', 1, 2]), random.random() < 0.7,
+                    random.randint(0, 9), random.randint(1, 7))
+            index_map, index = fill.indexMap(*args)
+            expected_map, expected_index = walk(*args)
+            self.assertEqual(index_map.tolist(), expected_map, args)
+            self.assertEqual(index, expected_index, args)
+
+    def testDirections(self):
+        row_wise, index = fill.indexMap(4, 4, 2, 2, 'row-wise', True, 0, 10)
+        self.assertEqual(row_wise[::2, ::2].tolist(), [[0, 2], [1, 3]])
+        self.assertEqual(index, 4)
+        col_wise, index = fill.indexMap(4, 4, 2, 2, 'col-wise', True, 0, 10)
+        self.assertEqual(col_wise[::2, ::2].tolist(), [[0, 1], [2, 3]])
+
+    def testLeftoverCellsUnfilled(self):
+        index_map, index = fill.indexMap(3, 5, 2, 2, 'row-wise', False, 1, 3)
+        self.assertTrue((index_map[:2, :4] == 1).all())
+        self.assertTrue((index_map[2] == fill.UNFILLED).all())
+        self.assertTrue((index_map[:, 4] == fill.UNFILLED).all())
+        self.assertEqual(index, 1)
+
+    def testUnknownDirection(self):
+        self.assertRaises(ValueError, fill.indexMap, 2, 2, 1, 1, 'diagonal', True, 0, 1)
+
+class AutoFillTest(unittest.TestCase):
+    def testMain3AndModelAgree(self):
+        catalog = model.Catalog()
+        samples = catalog.newSamples('g', ['s1', 's2', 's3'])
+        m = model.Plate('P1', 8, 12)
+        p = main3.Plate('P1', 8, 12)
+        next_model = model.Range(m.getWell('B2'), m.getWell('G11')).autoFill(
+            'sample', samples, index = 1, n_row = 2, n_column = 3, direction = 1)
+        next_main3 = main3.Range(p, (1, 1), (6, 10)).autoFill(
+            's', ['s1', 's2', 's3'], index = 1, nrow = 2, ncol = 3, direction = 'row-wise')
+        self.assertEqual(next_model, next_main3)
+        names = [[m.getWellAt(row, col).getSampleNames() for col in range(12)] for row in range(8)]
+        expected = [[name + ';' if name <> main3.NA else 'NA' for name in row]
+                    for row in p.get_layer('s', decode = True).tolist()]
+        self.assertEqual(names, expected)
+
+if __name__ == '__main__':
+    unittest.main()
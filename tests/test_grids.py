@@ -0,0 +1,75 @@
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import grids
+import main3
+import model
+
+def plate(ID, sample):
+    plate = main3.Plate(ID, 2, 3)
+    plate.set('s', sample, (0, 0))
+    plate.set('a', 'Tbp', (1, 2))
+    return plate
+
+class LayerNamedPlateTest(unittest.TestCase):
+    def parse(self, text):
+        return list(grids.parseAll(StringIO(text)))
+
+    def testPlatesNamedLikeLayers(self):
+        plates = [plate('P1', 's1'), plate('Samples', 's2'), plate('Assays', 's3'), plate('Values', 's4')]
+        out = StringIO()
+        main3.writePlates(out, plates, 'sav')
+        parsed = self.parse(out.getvalue())
+        self.assertEqual([ID for ID, layers in parsed], ['P1', 'Samples', 'Assays', 'Values'])
+        for (ID, layers), expected in zip(parsed, ['s1', 's2', 's3', 's4']):
+            self.assertEqual([layer for layer, row, col, cells in layers], ['s', 'a', 'v'])
+            rebuilt = grids.build(ID, layers)
+            self.assertEqual(rebuilt.get('s', (0, 0)), expected)
+            self.assertEqual(rebuilt.get('a', (1, 2)), 'Tbp')
+
+    def testModelPlateNamedLikeLayer(self):
+        catalog = model.Catalog()
+        sample, = catalog.newSamples('g', ['s1'])
+        first = model.Plate('P1', 2, 3)
+        second = model.Plate('Values', 2, 3)
+        second.getWell('A1').addSample(sample)
+        out = StringIO()
+        model.writePlates(out, [first, second])
+        parsed = self.parse(out.getvalue())
+        self.assertEqual([ID for ID, layers in parsed], ['P1', 'Values'])
+        self.assertEqual(parsed[1][1][0][3][0, 0], 's1')
+
+    def testModelDumpRoundTrip(self):
+        catalog = model.Catalog()
+        s1, s2 = catalog.newSamples('ctrl', ['s1', 's2'])
+        tbp, = catalog.newDetectors(['Tbp'])
+        dump = model.Plate('P1', 2, 3)
+        dump.getWell('A1').addSample(s1).addDetector(tbp).setValue(tbp, 21.5)
+        dump.getWell('B3').addSample(s2).addDetector(tbp)
+        out = StringIO()
+        model.writePlates(out, [dump], ('address', 'sample', 'group', 'detector', 'value'))
+        (ID, layers), = self.parse(out.getvalue())
+        self.assertEqual([layer for layer, row, col, cells in layers], ['s', 'a', 'v'])
+        plate = grids.build(ID, layers)
+        self.assertEqual(plate.get(None, (0, 0)), ('s1', 'Tbp', 21.5))
+        self.assertEqual(plate.get('s', (1, 2)), 's2')
+        self.assertEqual(plate.get('v', (1, 2)), main3.NA)
+        self.assertEqual(plate.get('s', (0, 1)), main3.NA)
+
+    def testSeveralValuesInAWellRaise(self):
+        layers = self.parse('Values:\n\t1\nA\tTbp:21.5;Gapdh:20;\n')[0][1]
+        self.assertRaises(grids.GridError, grids.build, 'P1', layers)
+
+    def testAmbiguousLabelRaises(self):
+        # an unlabelled grid (Range.show) then 'Samples:' and a grid: a
+        # second plate or the samples layer of the first
+        text = '\t1\t2\nA\ts1\tNA\n' + 'Samples:\n' + '\t1\t2\nA\ts2\tNA\n'
+        self.assertRaises(grids.GridError, self.parse, text)
+        self.assertEqual(len(self.parse(text.replace('Samples:', 'P2:'))), 2)
+
+if __name__ == '__main__':
+    unittest.main()
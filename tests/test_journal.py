@@ -0,0 +1,122 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np
+import journal
+import main3
+import model
+
+def layers(plate):
+    return [plate.get_layer(item_class) for item_class in 'sav']
+
+class Main3UndoTest(unittest.TestCase):
+    def setUp(self):
+        self.plate = main3.Plate('P1', 8, 12)
+        self.journal = journal.Journal().attach(self.plate)
+
+    def assertLayers(self, expected):
+        for before, after in zip(expected, layers(self.plate)):
+            np.testing.assert_array_equal(before, after)
+
+    def testRandomEditsUndoAndRedo(self):
+        random.seed(3)
+        states = [layers(self.plate)]
+        for step in range(30):
+            rng = main3.Range(self.plate, (random.randrange(8), random.randrange(12)),
+                              (random.randrange(8), random.randrange(12)))
+            edit = random.randrange(5)
+            if edit == 0:
+                rng.autoFill('s', ['s1', 's2', 's3'], nrow = 2, ncol = 1)
+            elif edit == 1:
+                rng.autoFill('a', ['Tbp', 'Gapdh'], nrow = 1, ncol = 2, direction = 'col-wise')
+            elif edit == 2:
+                rng.copy((random.randrange(8), random.randrange(12)), cut = random.random() < 0.5)
+            elif edit == 3:
+                rng.clearall(random.choice([None, 's', 'a']))
+            else:
+                self.plate.set('v', random.uniform(15, 35), (random.randrange(8), random.randrange(12)))
+            if self.journal.canUndo() and len(self.journal.undo_stack) == len(states):
+                states.append(layers(self.plate))
+            self.assertEqual(len(self.journal.undo_stack), len(states) - 1)
+        for state in reversed(states[:-1]):
+            self.journal.undo()
+            self.assertLayers(state)
+        self.assertFalse(self.journal.canUndo())
+        for state in states[1:]:
+            self.journal.redo()
+            self.assertLayers(state)
+
+    def testGestureIsOneStep(self):
+        whole = main3.Range(self.plate, (0, 0), (7, 11))
+        whole.autoFill('s', ['s1', 's2'], nrow = 1, ncol = 1)
+        whole.clearall()
+        self.assertEqual(len(self.journal.undo_stack), 2)
+        self.assertEqual(self.journal.undo(), 'clearall')
+        self.assertEqual(self.plate.get('s', (7, 11)), 's2')
+
+    def testNewEditDropsRedo(self):
+        self.plate.set('s', 's1', (0, 0))
+        self.journal.undo()
+        self.assertTrue(self.journal.canRedo())
+        self.plate.set('s', 's2', (1, 1))
+        self.assertFalse(self.journal.canRedo())
+        self.assertEqual(self.journal.redo(), None)
+
+    def testOldestEntriesDroppedPastMaxBytes(self):
+        self.journal.max_bytes = 1
+        for column in range(3):
+            self.plate.set('s', 's1', (0, column))
+        self.assertEqual(len(self.journal.undo_stack), 1)
+        self.journal.undo()
+        self.assertEqual(self.plate.get('s', (0, 1)), 's1')
+        self.assertEqual(self.plate.get('s', (0, 2)), main3.NA)
+
+    def testUnchangedEditIsNotJournaled(self):
+        self.plate.clear(None, (0, 0))
+        self.assertFalse(self.journal.canUndo())
+
+class ModelUndoTest(unittest.TestCase):
+    def setUp(self):
+        catalog = model.Catalog()
+        self.samples = catalog.newSamples('g', ['s1', 's2', 's3'])
+        self.detectors = catalog.newDetectors(['Tbp', 'Gapdh'])
+        self.plate = model.Plate('P1', 8, 12)
+        self.journal = journal.Journal().attach(self.plate)
+        self.whole = self.range((0, 0), (7, 11))
+
+    def range(self, start, end):
+        return model.Range(self.plate.getWellAt(*start), self.plate.getWellAt(*end))
+
+    def state(self):
+        return [(well.getSampleNames(), well.getDetectorNames(), well.getDetectorValues(), well.omit)
+                for well in self.plate.wellsIn((0, 0, 8, 12))]
+
+    def testEditsUndoAndRedo(self):
+        states = [self.state()]
+        self.whole.autoFill('sample', self.samples, n_row = 2, n_column = 1)
+        states.append(self.state())
+        self.whole.autoFill('detector', self.detectors, n_row = 1, n_column = 3)
+        states.append(self.state())
+        with self.plate.transaction('values'):
+            snapshot = self.plate._snapshot([self.plate.getWell('A1')])
+            self.plate.getWell('A1').setValue(self.detectors[0], 21.5).exclude()
+            self.plate._commit(snapshot, 'values')
+        states.append(self.state())
+        self.range((0, 0), (1, 5)).moveTo(self.range((4, 6), (5, 11)))
+        states.append(self.state())
+        self.range((2, 0), (3, 11)).clear('sample')
+        states.append(self.state())
+        for state in reversed(states[:-1]):
+            self.journal.undo()
+            self.assertEqual(self.state(), state)
+        for state in states[1:]:
+            self.journal.redo()
+            self.assertEqual(self.state(), state)
+        self.assertEqual(self.plate.getWell('E7').getValue(self.detectors[0]), 21.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import model
+
+class WellValuesTest(unittest.TestCase):
+    def setUp(self):
+        catalog = model.Catalog()
+        self.gapdh, self.tbp = catalog.newDetectors(['Gapdh', 'Tbp'])
+        self.plate = model.Plate('P1', 8, 12)
+        self.a1 = self.plate.getWell('A1')
+        self.b1 = self.plate.getWell('B1')
+        self.a1.addDetector(self.gapdh).addDetector(self.tbp)
+        self.a1.setValue(self.gapdh, 21.5)
+
+    def cell(self, address):
+        well = self.plate.getWell(address)
+        return model.Range(well, well)
+
+    def testCopyKeepsValues(self):
+        self.cell('A1').copyTo(self.cell('B1'), 'detector')
+        self.assertEqual(self.b1.getValue(self.gapdh), 21.5)
+        self.assertEqual(self.b1.getValue(self.tbp), None)
+        self.assertEqual(self.a1.getValue(self.gapdh), 21.5)
+
+    def testMoveCarriesValues(self):
+        self.cell('A1').moveTo(self.cell('B1'), 'detector')
+        self.assertEqual(self.b1.getValue(self.gapdh), 21.5)
+        self.assertEqual(self.a1.getValue(self.gapdh), None)
+        self.assertEqual(self.a1.detectors, set())
+
+    def testMoveAllCarriesValues(self):
+        self.cell('A1').moveTo(self.cell('B1'))
+        self.assertEqual(self.b1.getDetectorValues().count('21.5'), 1)
+
+    def testCopyReplacesOldValues(self):
+        self.b1.addDetector(self.tbp).setValue(self.tbp, 30.0)
+        self.cell('A1').copyTo(self.cell('B1'), 'detector')
+        self.assertEqual(self.b1.getValue(self.tbp), None)
+
+    def testRemoveDropsOnlyItsValue(self):
+        self.a1.setValue(self.tbp, 25.0)
+        self.a1.removeDetector(self.tbp)
+        self.assertEqual(self.a1.getValue(self.gapdh), 21.5)
+        self.assertEqual(self.a1.getValue(self.tbp), None)
+
+    def testClearDropsValuesOfClearedDetectors(self):
+        self.a1.clearDetectors()
+        self.assertEqual(self.a1.getValue(self.gapdh), None)
+        self.assertEqual(self.a1.values, None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import main3
+import planner
+
+def experiment(groups, targets, refs):
+    exp = main3.Experiment('E')
+    for group, num in groups:
+        exp.addSamples(group, num = num)
+    if targets:
+        exp.addAssays(targets)
+    if refs:
+        exp.addAssays(refs, isRef = True)
+    return exp
+
+class PlanTest(unittest.TestCase):
+    def assertComplete(self, exp, nrow, ncol, replicates):
+        plates = planner.plan(exp, nrow, ncol, replicates)
+        refs = [assay for assay in exp.get('a') if exp.isRef(assay)]
+        seen = set()
+        for plate in plates:
+            wells = {}
+            for sample, assay in zip(plate.get_layer('s', True).ravel(), plate.get_layer('a', True).ravel()):
+                if sample <> main3.NA:
+                    counts = wells.setdefault(sample, {})
+                    counts[assay] = counts.get(assay, 0) + 1
+            for sample, counts in wells.items():
+                # every run is whole, and the refs go wherever the sample goes
+                for ref in refs:
+                    self.assertEqual(counts.get(ref), replicates)
+                for assay, count in counts.items():
+                    self.assertEqual(count, replicates)
+                    seen.add((sample, assay))
+        self.assertEqual(seen, set((sample, assay) for sample in exp.get('s') for assay in exp.get('a')))
+        return plates
+
+    def testSmall(self):
+        exp = experiment([('g1', 10), ('g2', 7)], ['T1', 'T2', 'T3'], ['R1'])
+        plates = self.assertComplete(exp, 8, 12, 3)
+        self.assertEqual(len(plates), planner.lowerBound(exp, 8, 12, 3))
+
+    def testSplitSamples(self):
+        # 32 assays of a sample do not fit one 32 slot plate with room to spare
+        exp = experiment([('g1', 50)], ['T%d' % n for n in range(30)], ['R1', 'R2'])
+        plates = self.assertComplete(exp, 8, 12, 3)
+        self.assertTrue(len(plates) >= planner.lowerBound(exp, 8, 12, 3))
+
+    def testOnlyRefs(self):
+        self.assertComplete(experiment([('g1', 10)], [], ['R1', 'R2']), 8, 12, 2)
+
+    def testNoRefs(self):
+        exp = experiment([('g1', 33)], ['T1', 'T2'], [])
+        plates = self.assertComplete(exp, 16, 24, 3)
+        self.assertEqual(len(plates), planner.lowerBound(exp, 16, 24, 3))
+
+    def testLayout(self):
+        exp = experiment([('g', 2)], ['T', 'U'], ['R'])
+        plate, = planner.plan(exp, 2, 6, 2)
+        self.assertEqual(plate.get_layer('s', True).tolist(),
+                         [['g-1'] * 6, ['g-2'] * 6])
+        self.assertEqual(plate.get_layer('a', True).tolist(),
+                         [['T', 'T', 'U', 'U', 'R', 'R']] * 2)
+
+    def testErrors(self):
+        self.assertRaises(ValueError, planner.plan, experiment([('g', 2)], [], []))
+        self.assertRaises(ValueError, planner.slotsPerPlate, 8, 12, 13)
+        self.assertRaises(ValueError, planner.pack, ['s'], ['T'], ['R1', 'R2'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
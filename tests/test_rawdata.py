@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import journal
+import main3
+import model
+import rawdata
+
+EXPORT = ('* Experiment Name = test\n'
+          '\n'
+          '[Results]\n'
+          'Well\tWell Position\tSample Name\tTarget Name\tCT\n'
+          '1\tA1\ts1\tTbp\t21.5\n'
+          '2\tA2\ts1\tTbp\tUndetermined\n'
+          '2\tA2\ts2\tGapdh\t25.25\n'
+          '3\tA3\n'
+          '99\tZ99\ts3\tTbp\t30\n'
+          '\n'
+          '[Melt Curve]\n'
+          '1\tA1\ts1\tTbp\t1.0\n')
+
+class LoadTest(unittest.TestCase):
+    def testLoadLayers(self):
+        plate = main3.Plate('P1', 2, 3)
+        undo = journal.Journal().attach(plate)
+        stats = rawdata.loadLayers(plate, StringIO(EXPORT))
+        self.assertEqual(stats, {'rows' : 4, 'loaded' : 3, 'skipped' : 1, 'short' : 1})
+        self.assertEqual(plate.get(None, (0, 0)), ('s1', 'Tbp', 21.5))
+        # the last row of a well wins
+        self.assertEqual(plate.get(None, (0, 1)), ('s2', 'Gapdh', 25.25))
+        self.assertEqual(plate.get(None, (0, 2)), (main3.NA, main3.NA, main3.NA))
+        self.assertEqual(len(undo.undo_stack), 1)
+        undo.undo()
+        self.assertEqual(plate.get(None, (0, 0)), (main3.NA, main3.NA, main3.NA))
+
+    def testLoadWells(self):
+        catalog = model.Catalog()
+        s1, = catalog.newSamples('g', ['s1'])
+        plate = model.Plate('P1', 2, 3)
+        stats = rawdata.loadWells(plate, StringIO(EXPORT), catalog)
+        self.assertEqual(stats['short'], 1)
+        self.assertEqual(stats['skipped'], 1)
+        a2 = plate.getWell('A2')
+        tbp, gapdh = catalog.getDetector('Tbp'), catalog.getDetector('Gapdh')
+        self.assertEqual(a2.getValue(tbp), None)
+        self.assertEqual(a2.getValue(gapdh), 25.25)
+        self.assertEqual(plate.getWell('A1').getValue(tbp), 21.5)
+        self.assertEqual(plate.getWell('A1').samples, set([s1]))
+
+if __name__ == '__main__':
+    unittest.main()